@@ -12,12 +12,17 @@ from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.api import deps
-from app.utils.nic_json_utils import invoice_to_nic_json, nic_json_to_invoice
+from app.utils.nic_json_utils import dumps_nic, invoice_to_nic_json, load_invoice_with_items, nic_json_to_invoice
 
 router = APIRouter()
 
 
-@router.get("/invoice/{invoice_id}/json", response_model=schemas.NICJSONExport)
+# Returned pre-serialized, so the schema is declared for the docs only
+@router.get(
+    "/invoice/{invoice_id}/json",
+    response_class=Response,
+    responses={200: {"model": schemas.NICJSONExport, "content": {"application/json": {}}}},
+)
 def export_invoice_to_nic_json(
     *,
     db: Session = Depends(deps.get_db),
@@ -27,37 +32,19 @@ def export_invoice_to_nic_json(
     """
     Export an invoice to NIC-compliant JSON format
     """
-    # Get invoice with business profile and items
-    invoice = db.query(models.Invoice).join(
-        models.BusinessProfile
-    ).filter(
-        models.Invoice.id == invoice_id,
-        models.BusinessProfile.user_id == current_user.id
-    ).first()
+    # Get invoice with business profile, customer, items and products
+    invoice = load_invoice_with_items(db, invoice_id, current_user.id)
     
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
-    # Get business profile and customer
-    business_profile = db.query(models.BusinessProfile).filter(
-        models.BusinessProfile.id == invoice.business_profile_id
-    ).first()
-    
-    customer = db.query(models.Customer).filter(
-        models.Customer.id == invoice.customer_id
-    ).first()
-    
-    # Get invoice items with product details
-    items = db.query(models.InvoiceItem, models.Product).join(
-        models.Product
-    ).filter(
-        models.InvoiceItem.invoice_id == invoice.id
-    ).all()
+    items = [(item, item.product) for item in invoice.items]
     
     # Convert to NIC JSON format
-    nic_json = invoice_to_nic_json(invoice, business_profile, customer, items)
+    nic_json = invoice_to_nic_json(invoice, invoice.business_profile, invoice.customer, items)
     
-    return {"invoice_data": nic_json}
+    # Serialize directly; the payload is already plain JSON types, so skip re-validating it
+    return Response(content=dumps_nic({"invoice_data": nic_json}), media_type="application/json")
 
 
 @router.post("/invoice/import-json", response_model=schemas.Invoice)
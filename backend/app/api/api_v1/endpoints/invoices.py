@@ -8,7 +8,7 @@ from sqlalchemy import func
 from app import models, schemas
 from app.api import deps
 from app.models.invoice import TaxType, DocumentType, SupplyType, InvoiceStatus, PaymentStatus
-from app.utils.invoice_utils import calculate_tax, generate_invoice_pdf, generate_invoice_pdf_html, generate_gst_irp_json
+from app.utils.invoice_utils import calculate_tax, generate_invoice_pdf, generate_gst_irp_json, dump_gst_irp_json
 
 router = APIRouter()
 
@@ -569,8 +569,7 @@ def get_invoice_pdf(
         try:
             # Generate PDF
             print("Starting PDF generation...")
-            from app.utils.invoice_utils import generate_invoice_pdf_html
-            pdf_content = generate_invoice_pdf_html(invoice, business_profile, customer, items)
+            pdf_content = generate_invoice_pdf(invoice, business_profile, customer, items)
             print(f"PDF generated successfully, size: {len(pdf_content)} bytes")
             
             # Return PDF as response
@@ -669,9 +668,8 @@ def get_invoice_gst_json(
                     detail=f"Failed to generate GST JSON: {gst_json['error']}"
                 )
             
-            # Convert to JSON string
-            import json
-            json_content = json.dumps(gst_json, indent=2)
+            # Convert to JSON bytes
+            json_content = dump_gst_irp_json(gst_json)
             
             print(f"GST JSON generated successfully")
             
@@ -10,6 +10,19 @@ from app.api import deps
 router = APIRouter()
 
 
+def _user_from_orm(o: models.User) -> schemas.User:
+    # Rows were validated on the way in; skip re-running validators on the way out
+    return schemas.User.model_construct(
+        id=o.id,
+        email=o.email,
+        gstin=o.gstin,
+        is_active=o.is_active,
+        is_superuser=o.is_superuser,
+        created_at=o.created_at,
+        updated_at=o.updated_at,
+    )
+
+
 @router.get("/me", response_model=schemas.User)
 def read_user_me(
     current_user: models.User = Depends(deps.get_current_active_user),
@@ -17,7 +30,7 @@ def read_user_me(
     """
     Get current user
     """
-    return current_user
+    return _user_from_orm(current_user)
 
 
 @router.put("/me", response_model=schemas.User)
@@ -31,13 +44,13 @@ def update_user_me(
     Update own user
     """
     current_user_data = jsonable_encoder(current_user)
-    user_in = schemas.UserUpdate(**current_user_data)
+    user_in = schemas.USER_UPDATE_ADAPTER.validate_python(current_user_data)
     if user_in.password is not None:
         user_in.password = user_in.password
     if user_in.email is not None:
         user_in.email = user_in.email
     user = crud.user.update(db, db_obj=current_user, obj_in=user_in)
-    return user
+    return _user_from_orm(user)
 
 
 @router.get("/{user_id}", response_model=schemas.User)
@@ -51,9 +64,9 @@ def read_user_by_id(
     """
     user = crud.user.get(db, id=user_id)
     if user == current_user:
-        return user
+        return _user_from_orm(user)
     if not crud.user.is_superuser(current_user):
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
         )
-    return user 
\ No newline at end of file
+    return _user_from_orm(user) 
\ No newline at end of file
@@ -2,9 +2,8 @@ import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
 from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.api.api_v1.api import api_router
 from app.core.config import settings
@@ -15,15 +14,40 @@ frontend_host = frontend_origin.replace("https://", "").replace("http://", "")
 backend_host = os.getenv("BACKEND_HOST", "localhost")
 debug_mode = os.getenv("DEBUG", "true").lower() == "true"
 
+# Static body for the root route, encoded once at import
+_ROOT_BYTES = b'{"message":"Welcome to GSTInvoicePro API. Check /docs for API documentation."}'
+
+# Security headers, encoded once at import
+_SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _SECURITY_HEADERS)
+
 # Custom middleware for security headers
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        return response
+# Plain ASGI instead of BaseHTTPMiddleware so responses (including /docs and
+# the OpenAPI schema) are not re-wrapped in a streaming task per request
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Replace, not duplicate, any of these the route already set
+                message["headers"] = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                ] + _SECURITY_HEADERS
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -63,4 +87,4 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 # Root route
 @app.get("/")
 def root():
-    return {"message": "Welcome to GSTInvoicePro API. Check /docs for API documentation."}
\ No newline at end of file
+    return Response(content=_ROOT_BYTES, media_type="application/json")
@@ -1,4 +1,7 @@
-from app.schemas.user import User, UserCreate, UserUpdate, UserInDB
+from app.schemas.user import (
+    User, UserCreate, UserUpdate, UserInDB,
+    USER_ADAPTER, USER_IN_DB_ADAPTER, USER_CREATE_ADAPTER, USER_UPDATE_ADAPTER,
+)
 from app.schemas.business_profile import BusinessProfile, BusinessProfileCreate, BusinessProfileUpdate
 from app.schemas.customer import Customer, CustomerCreate, CustomerUpdate
 from app.schemas.product import Product, ProductCreate, ProductUpdate
@@ -1,7 +1,9 @@
 from typing import Optional
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 
+from app.utils.validation_utils import normalize_email_address
+
 
 # Shared properties
 class BusinessProfileBase(BaseModel):
@@ -13,10 +15,15 @@ class BusinessProfileBase(BaseModel):
     state_code: str = Field(..., min_length=2, max_length=2, description="State code (2 digits)")
     pin: str = Field(..., min_length=6, max_length=6, description="PIN code (6 digits)")
     phone: str = Field(..., min_length=10, max_length=10, description="Business phone number")
-    email: EmailStr = Field(..., description="Business email")
+    email: str = Field(..., description="Business email")
     logo_url: Optional[str] = Field(None, description="URL to business logo")
     is_default: Optional[bool] = Field(False, description="Whether this is the default business profile")
 
+    @field_validator('email', mode='after')
+    @classmethod
+    def validate_email_format(cls, v: str) -> str:
+        return normalize_email_address(v)
+
 
 # Properties to receive via API on creation
 class BusinessProfileCreate(BusinessProfileBase):
@@ -33,10 +40,17 @@ class BusinessProfileUpdate(BaseModel):
     state_code: Optional[str] = None
     pin: Optional[str] = None
     phone: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[str] = None
     logo_url: Optional[str] = None
     is_default: Optional[bool] = None
 
+    @field_validator('email', mode='after')
+    @classmethod
+    def validate_email_format(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None:
+            return normalize_email_address(v)
+        return v
+
 
 # Properties shared by models stored in DB
 class BusinessProfileInDBBase(BusinessProfileBase):
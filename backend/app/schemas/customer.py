@@ -1,9 +1,9 @@
 from typing import Optional
 import re
-from pydantic import BaseModel, Field, EmailStr, validator, field_validator, model_validator
+from pydantic import BaseModel, Field, validator, field_validator, model_validator
 from datetime import datetime
 
-from app.utils.validation_utils import validate_gstin, get_state_from_gstin
+from app.utils.validation_utils import normalize_email_address, validate_gstin, get_state_from_gstin
 
 
 # Shared properties
@@ -15,7 +15,7 @@ class CustomerBase(BaseModel):
     state: str = Field(..., description="State/Province where customer is located")
     country: str = Field("India", description="Country where customer is located")
     pincode: str = Field(..., description="Postal/ZIP code")
-    email: Optional[EmailStr] = Field(None, description="Customer email")
+    email: Optional[str] = Field(None, description="Customer email")
     phone: Optional[str] = Field(None, description="Customer phone number")
     notes: Optional[str] = Field(None, description="Additional notes about the customer")
 
@@ -52,6 +52,13 @@ class CustomerBase(BaseModel):
         
         return self
 
+    @field_validator('email', mode='after')
+    @classmethod
+    def validate_email_format(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None:
+            return normalize_email_address(v)
+        return v
+
     @validator('gstin')
     def validate_gstin_format(cls, v, values):
         if v is not None and v and len(v) > 0:
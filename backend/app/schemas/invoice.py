@@ -42,6 +42,7 @@ class InvoiceItemInDBBase(InvoiceItemBase):
 
     class Config:
         from_attributes = True
+        use_enum_values = True
 
 
 class InvoiceItem(InvoiceItemInDBBase):
@@ -153,14 +154,41 @@ class InvoiceInDBBase(InvoiceBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    class Config:
+        from_attributes = True
+        use_enum_values = True
+
+
+# Customer and business profile details embedded in invoice responses
+class InvoiceCustomer(BaseModel):
+    id: int
+    name: str
+    gstin: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class InvoiceBusinessProfile(BaseModel):
+    id: int
+    name: str
+    gstin: Optional[str] = None
+    address: Optional[str] = None
+    state: Optional[str] = None
+
     class Config:
         from_attributes = True
 
 
 class Invoice(InvoiceInDBBase):
     items: List[InvoiceItem]
-    customer: Optional[Dict[str, Any]] = None
-    business_profile: Optional[Dict[str, Any]] = None
+    customer: Optional[InvoiceCustomer] = None
+    business_profile: Optional[InvoiceBusinessProfile] = None
 
 
 # NIC JSON Export/Import Schema
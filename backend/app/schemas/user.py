@@ -1,51 +1,74 @@
-from typing import Optional, List
-from pydantic import BaseModel, EmailStr, Field, validator
+from typing import Annotated, Optional, List
+from pydantic import AfterValidator, BaseModel, BeforeValidator, ConfigDict, Field, StringConstraints, TypeAdapter, field_validator
 from datetime import datetime
 
-from app.utils.validation_utils import validate_gstin
+from app.utils.validation_utils import normalize_email_address, validate_gstin
+
+
+# Password input; the upper bound caps the work handed to the password hasher
+Password = Annotated[str, StringConstraints(min_length=8, max_length=128)]
+
+
+def _validate_gstin_format(v: str) -> str:
+    is_valid, error_message = validate_gstin(v)
+    if not is_valid:
+        raise ValueError(error_message)
+    return v
+
+
+def _normalize_gstin(v):
+    return v.strip().upper() if isinstance(v, str) else v
+
+
+# Bound to the str branch of Optional[...], so None never reaches the validators;
+# GSTINs are canonicalized to uppercase at ingress before the format check
+GSTIN = Annotated[str, BeforeValidator(_normalize_gstin), AfterValidator(_validate_gstin_format)]
 
 
 # Shared properties
 class UserBase(BaseModel):
-    email: EmailStr = Field(..., description="Email address of the user")
-    gstin: Optional[str] = Field(None, description="GSTIN of the user")
+    email: str = Field(..., description="Email address of the user")
+    gstin: Optional[GSTIN] = Field(None, description="GSTIN of the user")
     is_active: Optional[bool] = Field(True, description="Is user active")
     is_superuser: Optional[bool] = Field(False, description="Is user a superuser")
 
-    @validator('gstin')
-    def validate_gstin_format(cls, v):
-        if v is not None:
-            is_valid, error_message = validate_gstin(v)
-            if not is_valid:
-                raise ValueError(error_message)
-        return v
+    @field_validator('email', mode='after')
+    @classmethod
+    def validate_email_format(cls, v: str) -> str:
+        return normalize_email_address(v)
 
 
 # Properties to receive via API on creation
 class UserCreate(UserBase):
-    password: str = Field(..., min_length=8, description="Password for the user")
+    password: Password = Field(..., description="Password for the user")
 
 
 # Properties to receive via API on update
 class UserUpdate(UserBase):
-    password: Optional[str] = Field(None, min_length=8, description="New password for the user")
+    password: Optional[Password] = Field(None, description="New password for the user")
 
 
-# Properties shared by models stored in DB
-class UserInDBBase(UserBase):
+# Properties shared by models stored in DB, returned via API as-is
+class User(UserBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    # Read-only DTOs between layers; inbound UserCreate/UserUpdate stay mutable
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
-# Additional properties to return via API
-class User(UserInDBBase):
-    pass
+# User adds nothing on top of the DB base, so share one validator/serializer
+UserInDBBase = User
 
 
 # Additional properties stored in DB but not returned by API
-class UserInDB(UserInDBBase):
-    hashed_password: str 
\ No newline at end of file
+class UserInDB(User):
+    hashed_password: str 
+
+
+# Shared adapters so callers validating raw dicts reuse one validator each
+USER_ADAPTER: TypeAdapter[User] = TypeAdapter(User)
+USER_IN_DB_ADAPTER: TypeAdapter[UserInDB] = TypeAdapter(UserInDB)
+USER_CREATE_ADAPTER: TypeAdapter[UserCreate] = TypeAdapter(UserCreate)
+USER_UPDATE_ADAPTER: TypeAdapter[UserUpdate] = TypeAdapter(UserUpdate)
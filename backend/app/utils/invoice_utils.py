@@ -1,23 +1,301 @@
-from typing import Dict, List, Tuple, Any
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 import tempfile
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, KeepTogether, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, Image, KeepTogether, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm, cm
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
 from io import BytesIO
 from jinja2 import Environment, FileSystemLoader
 import os
 from pathlib import Path
-import decimal
+import hashlib
+import logging
+import threading
+import orjson
 from datetime import datetime
+from functools import lru_cache, partial
+from collections import OrderedDict
+from sqlalchemy import inspect as sa_inspect
 
 from app.models import Invoice, BusinessProfile, Customer, InvoiceItem, Product, TaxType
+from app.models.invoice import DocumentType, SupplyType
 
-# Set decimal precision for currency formatting
-decimal.getcontext().prec = 2
+logger = logging.getLogger(__name__)
+
+# Skip per-attribute validation on graphics shapes; invoice drawings are built here, not from user input
+rl_config.shapeChecking = 0
+# Deterministic output (no creation timestamp or random document ID) so identical
+# invoices produce identical bytes, and flate-compressed page streams
+rl_config.invariant = 1
+rl_config.pageCompression = 1
+
+# Professional color scheme with lighter colors
+_PRIMARY_COLOR = colors.HexColor('#4285F4')  # Google blue
+_SECONDARY_COLOR = colors.HexColor('#34A853')  # Google green
+_ACCENT_COLOR = colors.HexColor('#FBBC05')  # Google yellow
+_LIGHT_COLOR = colors.HexColor('#F8F9FA')  # Very light gray for alternating rows
+_BORDER_COLOR = colors.HexColor('#E0E0E0')  # Light gray for borders
+_TEXT_COLOR = colors.HexColor('#202124')  # Dark gray for text
+
+
+def _build_styles():
+    """
+    Build the invoice stylesheet once; ParagraphStyles are read-only during layout
+    """
+    styles = getSampleStyleSheet()
+
+    # Title style
+    styles.add(ParagraphStyle(
+        name='InvoiceTitle',
+        parent=styles['Heading1'],
+        fontSize=14,
+        alignment=TA_CENTER,
+        textColor=_PRIMARY_COLOR,
+        spaceAfter=3*mm,
+        fontName='Helvetica-Bold',
+    ))
+
+    # Heading styles
+    styles.add(ParagraphStyle(
+        name='InvoiceHeading',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=_PRIMARY_COLOR,
+        spaceAfter=2*mm,
+        fontName='Helvetica-Bold',
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceSubheading',
+        parent=styles['Heading3'],
+        fontSize=10,
+        textColor=_SECONDARY_COLOR,
+        spaceAfter=1*mm,
+        fontName='Helvetica-Bold',
+    ))
+
+    # Text alignment styles
+    styles.add(ParagraphStyle(
+        name='InvoiceRight',
+        parent=styles['Normal'],
+        alignment=TA_RIGHT,
+        fontSize=8,
+        textColor=_TEXT_COLOR,
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceCenter',
+        parent=styles['Normal'],
+        alignment=TA_CENTER,
+        fontSize=8,
+        textColor=_TEXT_COLOR,
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceBold',
+        parent=styles['Normal'],
+        fontName='Helvetica-Bold',
+        fontSize=8,
+        textColor=_TEXT_COLOR,
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceNormal',
+        parent=styles['Normal'],
+        fontSize=8,
+        leading=10,
+        textColor=_TEXT_COLOR,
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceSmall',
+        parent=styles['Normal'],
+        fontSize=7,
+        leading=9,
+        textColor=colors.darkgray,
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceTotal',
+        parent=styles['Normal'],
+        fontName='Helvetica-Bold',
+        fontSize=9,
+        alignment=TA_RIGHT,
+        textColor=_PRIMARY_COLOR,
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InvoiceFooter',
+        parent=styles['Normal'],
+        fontSize=7,
+        alignment=TA_CENTER,
+        textColor=colors.darkgray,
+    ))
+
+    # Section title style
+    styles.add(ParagraphStyle(
+        name='SectionTitle',
+        parent=styles['Normal'],
+        fontName='Helvetica-Bold',
+        fontSize=9,
+        textColor=_PRIMARY_COLOR,
+        spaceBefore=2*mm,
+        spaceAfter=1*mm,
+    ))
+
+    return styles
+
+
+_STYLES = _build_styles()
+
+# Items table header rows; bold/white text comes from the table's header style.
+# Plain strings don't wrap, so the rate headers are split over two lines to fit
+# the narrow tax-rate columns
+_IGST_HEADER_CELLS = ('#', 'Item', 'HSN', 'Qty', 'Rate', 'Amount', 'IGST\n%', 'IGST', 'Total')
+_CGST_SGST_HEADER_CELLS = ('#', 'Item', 'HSN', 'Qty', 'Rate', 'Amount', 'CGST\n%', 'CGST', 'SGST\n%', 'SGST', 'Total')
+_ITEMS_HEADER_FONT = 'Helvetica-Bold'
+_ITEMS_HEADER_FONT_SIZE = 8
+_ITEMS_HEADER_PADDING = 1  # Left/right padding of header cells
+
+# Items table column widths on A4 with 10mm side margins (the SimpleDocTemplate frame width)
+_DOC_WIDTH = A4[0] - 10*mm - 10*mm
+_IGST_COL_WIDTHS = (
+    12,                     # Item number column
+    _DOC_WIDTH * 0.28,     # Item description
+    _DOC_WIDTH * 0.08,     # HSN/SAC
+    _DOC_WIDTH * 0.07,     # Qty
+    _DOC_WIDTH * 0.07,     # Rate
+    _DOC_WIDTH * 0.09,     # Amount
+    _DOC_WIDTH * 0.06,     # IGST %
+    _DOC_WIDTH * 0.09,     # IGST
+    _DOC_WIDTH * 0.10,     # Total
+)
+
+_CGST_SGST_COL_WIDTHS = (
+    12,                     # Item number column
+    _DOC_WIDTH * 0.24,     # Item description
+    _DOC_WIDTH * 0.07,     # HSN/SAC
+    _DOC_WIDTH * 0.06,     # Qty
+    _DOC_WIDTH * 0.06,     # Rate
+    _DOC_WIDTH * 0.08,     # Amount
+    _DOC_WIDTH * 0.05,     # CGST %
+    _DOC_WIDTH * 0.07,     # CGST
+    _DOC_WIDTH * 0.05,     # SGST %
+    _DOC_WIDTH * 0.07,     # SGST
+    _DOC_WIDTH * 0.09,     # Total
+)
+
+# Fixed table styles, shared by every generated invoice
+_HEADER_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+_HEADER_RULE_STYLE = TableStyle([
+    ('LINEBELOW', (0, 0), (-1, 0), 0.5, _ACCENT_COLOR),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 1),
+])
+
+_CONTACT_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ('BACKGROUND', (0, 0), (0, 0), _LIGHT_COLOR),  # Background for "FROM" header
+    ('BACKGROUND', (1, 0), (1, 0), _LIGHT_COLOR),  # Background for "TO" header
+])
+
+_INVOICE_DETAILS_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ('BACKGROUND', (0, 0), (0, 0), _LIGHT_COLOR),  # Background for header
+])
+
+_ITEMS_TABLE_STYLE = TableStyle([
+    # Header styling
+    ('BACKGROUND', (0, 0), (-1, 0), _PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), _ITEMS_HEADER_FONT),
+    ('FONTSIZE', (0, 0), (-1, 0), _ITEMS_HEADER_FONT_SIZE),
+    ('LEADING', (0, 0), (-1, 0), _ITEMS_HEADER_FONT_SIZE + 1),
+    ('LEFTPADDING', (0, 0), (-1, 0), _ITEMS_HEADER_PADDING),
+    ('RIGHTPADDING', (0, 0), (-1, 0), _ITEMS_HEADER_PADDING),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 3),
+    ('TOPPADDING', (0, 0), (-1, 0), 3),
+
+    # Content styling, with alternating row colors for better readability
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, _LIGHT_COLOR]),
+    ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # Center the item numbers
+    ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),  # Right align numeric columns
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTSIZE', (1, 1), (1, -1), 8),  # Plain item names at the Paragraph size
+    ('FONTNAME', (-1, 1), (-1, -1), 'Helvetica-Bold'),  # Bold row totals
+    ('FONTSIZE', (-1, 1), (-1, -1), 8),
+
+    # Grid styling - more subtle borders
+    ('GRID', (0, 0), (-1, -1), 0.5, _BORDER_COLOR),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.5, _PRIMARY_COLOR),  # Thicker line below header
+
+    # Row padding - reduce padding to make more compact
+    ('TOPPADDING', (0, 1), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
+])
+
+_SUMMARY_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    # Amount cells are plain strings; match the InvoiceRight paragraph style
+    ('FONTNAME', (1, 0), (1, -2), 'Helvetica'),
+    ('FONTSIZE', (1, 0), (1, -2), 8),
+    ('TEXTCOLOR', (1, 0), (1, -2), _TEXT_COLOR),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('LINEABOVE', (0, -1), (1, -1), 0.5, _PRIMARY_COLOR),  # Line above total
+    ('TOPPADDING', (0, -1), (1, -1), 3),  # Extra padding for total
+    ('BOTTOMPADDING', (0, -1), (1, -1), 3),  # Extra padding for total
+    ('BACKGROUND', (0, -1), (1, -1), _LIGHT_COLOR),  # Background color for total row
+])
+
+_NOTES_TABLE_STYLE = TableStyle([
+    ('BOX', (0, 0), (-1, -1), 0.5, _BORDER_COLOR),
+    ('BACKGROUND', (0, 0), (-1, -1), _LIGHT_COLOR),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+])
+
+_PAYMENT_TABLE_STYLE = TableStyle([
+    ('BOX', (0, 0), (-1, -1), 0.5, _BORDER_COLOR),
+    ('BACKGROUND', (0, 0), (0, 0), _LIGHT_COLOR),  # Single cell, shaded like the notes box
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('LEFTPADDING', (0, 0), (-1, -1), 4),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+])
+
+_FOOTER_TABLE_STYLE = TableStyle([
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('FONTSIZE', (1, 0), (1, -1), 8),
+    ('TEXTCOLOR', (1, 0), (1, -1), _TEXT_COLOR),
+    ('FONTNAME', (1, -1), (1, -1), 'Helvetica-Bold'),  # Authorized Signatory
+])
+
+_DISCLAIMER_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+    ('LINEABOVE', (0, 0), (0, 0), 0.5, _BORDER_COLOR),
+    ('TOPPADDING', (0, 0), (0, 0), 3),
+])
 
 
 def calculate_tax(subtotal: float, tax_rate: float, tax_type: TaxType) -> Dict[str, float]:
@@ -43,126 +321,302 @@ def calculate_tax(subtotal: float, tax_rate: float, tax_type: TaxType) -> Dict[s
         }
 
 
+_UNITS = ('', 'One', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight', 'Nine', 'Ten', 'Eleven', 'Twelve',
+          'Thirteen', 'Fourteen', 'Fifteen', 'Sixteen', 'Seventeen', 'Eighteen', 'Nineteen')
+_TENS = ('', '', 'Twenty', 'Thirty', 'Forty', 'Fifty', 'Sixty', 'Seventy', 'Eighty', 'Ninety')
+_DENOMINATIONS = ((10000000, 'Crore'), (100000, 'Lakh'), (1000, 'Thousand'))
+
+
+def _append_words(n, out):
+    """
+    Append the words for n to out, largest denomination first
+    """
+    if n < 20:
+        if n:
+            out.append(_UNITS[n])
+        return
+    
+    if n < 100:
+        out.append(_TENS[n // 10])
+        if n % 10:
+            out.append(_UNITS[n % 10])
+        return
+    
+    if n < 1000:
+        out.append(_UNITS[n // 100])
+        out.append('Hundred')
+        if n % 100:
+            out.append('and')
+            _append_words(n % 100, out)
+        return
+    
+    for divisor, label in _DENOMINATIONS:
+        if n >= divisor:
+            _append_words(n // divisor, out)
+            out.append(label)
+            if n % divisor:
+                _append_words(n % divisor, out)
+            return
+
+
+def _get_words(n):
+    out = []
+    _append_words(n, out)
+    return ' '.join(out)
+
+
+@lru_cache(maxsize=4096)
+def _amount_words(rupees, paise):
+    """
+    Words for a whole-rupee amount plus paise, memoized on the integer pair
+    """
+    words = _get_words(rupees)
+    if paise > 0:
+        words += ' and ' + _get_words(paise) + ' Paise'
+    return words
+
+
 def num_to_words(num):
     """
     Convert a number to words representation for Indian Rupees
     """
-    def _get_words(n):
-        units = ['', 'One', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight', 'Nine', 'Ten', 'Eleven', 'Twelve', 
-                'Thirteen', 'Fourteen', 'Fifteen', 'Sixteen', 'Seventeen', 'Eighteen', 'Nineteen']
-        tens = ['', '', 'Twenty', 'Thirty', 'Forty', 'Fifty', 'Sixty', 'Seventy', 'Eighty', 'Ninety']
-        
-        if n < 20:
-            return units[n]
-        
-        if n < 100:
-            return tens[n // 10] + ('' if n % 10 == 0 else ' ' + units[n % 10])
-        
-        if n < 1000:
-            return units[n // 100] + ' Hundred' + ('' if n % 100 == 0 else ' and ' + _get_words(n % 100))
-        
-        if n < 100000:
-            return _get_words(n // 1000) + ' Thousand' + ('' if n % 1000 == 0 else ' ' + _get_words(n % 1000))
-        
-        if n < 10000000:
-            return _get_words(n // 100000) + ' Lakh' + ('' if n % 100000 == 0 else ' ' + _get_words(n % 100000))
-        
-        return _get_words(n // 10000000) + ' Crore' + ('' if n % 10000000 == 0 else ' ' + _get_words(n % 10000000))
-    
     # Handle zero
     if num == 0:
         return 'Zero'
     
-    # Split the number into integer and decimal parts
+    # Split the number into integer and decimal parts; the integer pair keys the
+    # cache so float noise on the same amount still hits
     int_part = int(num)
     decimal_part = int(round((num - int_part) * 100))
     
-    # Convert integer part to words
-    words = _get_words(int_part)
-    
-    # Add decimal part if present
-    if decimal_part > 0:
-        words += ' and ' + _get_words(decimal_part) + ' Paise'
-    
-    return words
+    return _amount_words(int_part, decimal_part)
 
 
-def generate_invoice_pdf(
+def _format_date(value, default="N/A"):
+    """
+    Format a date as DD-MM-YYYY without going through strftime's locale handling
+    """
+    if not value:
+        return default
+    try:
+        return f"{value.day:02d}-{value.month:02d}-{value.year}"
+    except AttributeError:
+        return str(value)
+
+
+def _generation_timestamp():
+    return datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+
+
+_ITEM_AMOUNT_FIELDS = ('quantity', 'rate', 'subtotal', 'tax_rate', 'total', 'cgst', 'sgst', 'igst')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce_item(item) -> Tuple[float, ...]:
+    """
+    Read an invoice item's amounts as floats in one pass
+
+    Returns (quantity, rate, subtotal, tax_rate, total, cgst, sgst, igst). Missing
+    attributes count as 0; None or unparseable amounts are derived from quantity * rate.
+    """
+    try:
+        return tuple(float(getattr(item, name, 0)) for name in _ITEM_AMOUNT_FIELDS)
+    except (TypeError, ValueError):
+        pass
+
+    quantity, rate, subtotal, tax_rate, total, cgst, sgst, igst = (
+        _to_float(getattr(item, name, 0)) for name in _ITEM_AMOUNT_FIELDS
+    )
+    quantity = quantity if quantity is not None else 0.0
+    rate = rate if rate is not None else 0.0
+    subtotal = subtotal if subtotal is not None else quantity * rate
+    tax_rate = tax_rate if tax_rate is not None else 0.0
+    total = total if total is not None else subtotal * (1 + tax_rate/100)
+    cgst = cgst if cgst is not None else subtotal * (tax_rate/200)
+    sgst = sgst if sgst is not None else subtotal * (tax_rate/200)
+    igst = igst if igst is not None else subtotal * (tax_rate/100)
+    return quantity, rate, subtotal, tax_rate, total, cgst, sgst, igst
+
+
+@lru_cache(maxsize=1024)
+def _desc_html(name: str, description: str) -> str:
+    """
+    Item cell markup: product name with a short secondary description line
+    """
+    # Limit description length to prevent layout issues
+    short_desc = description if len(description) <= 50 else description[:50] + "..."
+    return f"{name}<br/><font size='7'>{short_desc}</font>"
+
+
+def _igst_item_row(idx, description, hsn, quantity, unit, rate, subtotal, tax_rate, cgst, sgst, igst, total):
+    return [
+        str(idx),
+        description,
+        hsn,
+        f"{quantity} {unit}",
+        f"{rate:.2f}",
+        f"{subtotal:.2f}",
+        f"{tax_rate:.1f}%",
+        f"{igst:.2f}",
+        f"{total:.2f}",
+    ]
+
+
+def _cgst_sgst_item_row(idx, description, hsn, quantity, unit, rate, subtotal, tax_rate, cgst, sgst, igst, total):
+    half_rate = f"{tax_rate/2:.1f}%"
+    return [
+        str(idx),
+        description,
+        hsn,
+        f"{quantity} {unit}",
+        f"{rate:.2f}",
+        f"{subtotal:.2f}",
+        half_rate,
+        f"{cgst:.2f}",
+        half_rate,
+        f"{sgst:.2f}",
+        f"{total:.2f}",
+    ]
+
+
+class PageCounterCanvas(canvas.Canvas):
+    """
+    Canvas that stamps "Page N of M" on multi-page invoices
+    """
+    def __init__(self, *args, **kwargs):
+        self._page_width = kwargs.pop('page_width', A4[0])
+        canvas.Canvas.__init__(self, *args, **kwargs)
+
+    # Each page references a per-page form XObject; the forms are only
+    # drawn in save() once the total is known, so no page state is copied
+    def showPage(self):
+        self.doForm(f"pageNumber{self._pageNumber}")
+        canvas.Canvas.showPage(self)
+
+    def save(self):
+        page_count = self._pageNumber - 1
+        for page_number in range(1, page_count + 1):
+            self.beginForm(f"pageNumber{page_number}")
+            self.draw_page_number(page_number, page_count)
+            self.endForm()
+        canvas.Canvas.save(self)
+
+    def draw_page_number(self, page_number, page_count):
+        if page_count > 1:
+            self.setFont("Helvetica", 7)
+            self.drawRightString(
+                self._page_width - 10*mm,
+                10*mm,
+                f"Page {page_number} of {page_count}"
+            )
+
+
+# Hand-written one-page PDF, returned when even the canvas error PDF cannot be drawn
+_EMERGENCY_PDF = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj 2 0 obj<</Type/Pages/Count 1/Kids[3 0 R]>>endobj 3 0 obj<</Type/Page/MediaBox[0 0 612 792]/Resources<<>>/Contents 4 0 R>>endobj 4 0 obj<</Length 68>>stream\nBT\n/F1 12 Tf\n72 700 Td\n(Error Generating Invoice PDF) Tj\nET\nendstream\nendobj\ntrailer<</Size 5/Root 1 0 R>>\n%%EOF"
+
+
+def _render_error_pdf(message: str) -> bytes:
+    """
+    Draw an ultra-simple error PDF with no styles, falling back to _EMERGENCY_PDF
+    """
+    try:
+        logger.warning("Attempting ultra-simple PDF fallback")
+        ultra_buffer = BytesIO()
+        c = canvas.Canvas(ultra_buffer, pagesize=letter)
+        c.setFont("Helvetica", 14)
+        c.drawString(72, 700, "Error Generating Invoice PDF")
+        c.setFont("Helvetica", 10)
+        c.drawString(72, 670, "An error occurred while generating the PDF:")
+        c.drawString(72, 650, message[:100])  # Limit error message length
+        c.drawString(72, 630, "Please check the server logs for more details.")
+        c.save()
+        logger.debug("Created ultra-simple PDF fallback")
+        return ultra_buffer.getvalue()
+    except Exception:
+        # If even this fails, return a simple error message as PDF
+        logger.error("Using emergency text-only PDF")
+        return _EMERGENCY_PDF
+
+
+def _deliver(pdf_data: bytes, out: Optional[BinaryIO]) -> Optional[bytes]:
+    """
+    Return pdf_data, or write it to out and return None when a sink was given
+    """
+    if out is None:
+        return pdf_data
+    out.write(pdf_data)
+    return None
+
+
+def _generate_invoice_pdf_reportlab(
     invoice: Invoice,
     business_profile: BusinessProfile,
     customer: Customer,
-    items: List[Tuple[InvoiceItem, Product]]
-) -> bytes:
+    items: List[Tuple[InvoiceItem, Product]],
+    generation_time: Optional[str] = None,
+    out: Optional[BinaryIO] = None,
+    cache_key: Optional[str] = None
+) -> Optional[bytes]:
     """
     Generate PDF from invoice data using ReportLab with enhanced professional styling
+    Used as the fallback when no HTML renderer is available
     """
     try:
-        print("Initializing PDF generation...")
-        buffer = BytesIO()
+        logger.debug("Initializing PDF generation")
+        
+        # Resolve the named styles once for this build
+        title_style = _STYLES['InvoiceTitle']
+        heading_style = _STYLES['InvoiceHeading']
+        section_style = _STYLES['SectionTitle']
+        normal_style = _STYLES['InvoiceNormal']
+        bold_style = _STYLES['InvoiceBold']
+        center_style = _STYLES['InvoiceCenter']
+        small_style = _STYLES['InvoiceSmall']
+        total_style = _STYLES['InvoiceTotal']
+        footer_style = _STYLES['InvoiceFooter']
         
         # Make sure all required attributes are available
-        if not hasattr(business_profile, 'name') or not business_profile.name:
-            print("Warning: Business name is missing")
+        if not business_profile.name:
+            logger.warning("Business name is missing")
             business_profile.name = "Business Name"
             
-        if not hasattr(business_profile, 'gstin') or not business_profile.gstin:
-            print("Warning: Business GSTIN is missing")
+        if not business_profile.gstin:
+            logger.warning("Business GSTIN is missing")
             business_profile.gstin = "N/A"
             
-        if not hasattr(business_profile, 'address') or not business_profile.address:
-            print("Warning: Business address is missing")
+        if not business_profile.address:
+            logger.warning("Business address is missing")
             business_profile.address = ""
             
-        if not hasattr(business_profile, 'state') or not business_profile.state:
-            print("Warning: Business state is missing")
+        if not business_profile.state:
+            logger.warning("Business state is missing")
             business_profile.state = ""
             
-        if not hasattr(customer, 'name') or not customer.name:
-            print("Warning: Customer name is missing")
+        if not customer.name:
+            logger.warning("Customer name is missing")
             customer.name = "Customer"
             
-        if not hasattr(customer, 'address') or not customer.address:
-            print("Warning: Customer address is missing")
+        if not customer.address:
+            logger.warning("Customer address is missing")
             customer.address = ""
             
-        if not hasattr(customer, 'state') or not customer.state:
-            print("Warning: Customer state is missing")
+        if not customer.state:
+            logger.warning("Customer state is missing")
             customer.state = ""
         
         # Create PDF document with A4 paper size (more standard for invoices)
-        print("Creating PDF document...")
-        buffer = BytesIO()
+        logger.debug("Creating PDF document")
+        buffer = out if out is not None else BytesIO()
         
         # Use a slightly smaller page size for more compact layout
         page_width, page_height = A4
         
-        # Create a custom canvas to check page count
-        class PageCounterCanvas(canvas.Canvas):
-            def __init__(self, *args, **kwargs):
-                canvas.Canvas.__init__(self, *args, **kwargs)
-                self.pages = []
-                
-            def showPage(self):
-                self.pages.append(dict(self.__dict__))
-                self._startPage()
-                
-            def save(self):
-                page_count = len(self.pages)
-                for page in self.pages:
-                    self.__dict__.update(page)
-                    self.draw_page_number(page_count)
-                    canvas.Canvas.showPage(self)
-                canvas.Canvas.save(self)
-                
-            def draw_page_number(self, page_count):
-                if page_count > 1:
-                    self.setFont("Helvetica", 7)
-                    self.drawRightString(
-                        page_width - 10*mm, 
-                        10*mm, 
-                        f"Page {self._pageNumber} of {page_count}"
-                    )
-        
         doc = SimpleDocTemplate(
             buffer,
             pagesize=A4,
@@ -173,467 +627,144 @@ def generate_invoice_pdf(
             title=f"Invoice {invoice.invoice_number}"
         )
         
-        # Define professional color scheme with lighter colors
-        primary_color = colors.HexColor('#4285F4')  # Google blue
-        secondary_color = colors.HexColor('#34A853')  # Google green
-        accent_color = colors.HexColor('#FBBC05')  # Google yellow
-        light_color = colors.HexColor('#F8F9FA')    # Very light gray for alternating rows
-        border_color = colors.HexColor('#E0E0E0')  # Light gray for borders
-        text_color = colors.HexColor('#202124')  # Dark gray for text
-        
-        # Get base styles
-        styles = getSampleStyleSheet()
         elements = []
         
-        print("Adding styles...")
-        # Add custom styles with unique names to avoid conflicts
-        try:
-            # Title style
-            styles.add(ParagraphStyle(
-                name='InvoiceTitle',
-                parent=styles['Heading1'],
-                fontSize=14,
-                alignment=TA_CENTER,
-                textColor=primary_color,
-                spaceAfter=3*mm,
-                fontName='Helvetica-Bold',
-            ))
-            
-            # Heading styles
-            styles.add(ParagraphStyle(
-                name='InvoiceHeading',
-                parent=styles['Heading2'],
-                fontSize=12,
-                textColor=primary_color,
-                spaceAfter=2*mm,
-                fontName='Helvetica-Bold',
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceSubheading',
-                parent=styles['Heading3'],
-                fontSize=10,
-                textColor=secondary_color,
-                spaceAfter=1*mm,
-                fontName='Helvetica-Bold',
-            ))
-            
-            # Text alignment styles
-            styles.add(ParagraphStyle(
-                name='InvoiceRight',
-                parent=styles['Normal'],
-                alignment=TA_RIGHT,
-                fontSize=8,
-                textColor=text_color,
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceCenter',
-                parent=styles['Normal'],
-                alignment=TA_CENTER,
-                fontSize=8,
-                textColor=text_color,
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceBold',
-                parent=styles['Normal'],
-                fontName='Helvetica-Bold',
-                fontSize=8,
-                textColor=text_color,
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceNormal',
-                parent=styles['Normal'],
-                fontSize=8,
-                leading=10,
-                textColor=text_color,
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceSmall',
-                parent=styles['Normal'],
-                fontSize=7,
-                leading=9,
-                textColor=colors.darkgray,
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceTotal',
-                parent=styles['Normal'],
-                fontName='Helvetica-Bold',
-                fontSize=9,
-                alignment=TA_RIGHT,
-                textColor=primary_color,
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='InvoiceFooter',
-                parent=styles['Normal'],
-                fontSize=7,
-                alignment=TA_CENTER,
-                textColor=colors.darkgray,
-            ))
-            
-            # Section title style
-            styles.add(ParagraphStyle(
-                name='SectionTitle',
-                parent=styles['Normal'],
-                fontName='Helvetica-Bold',
-                fontSize=9,
-                textColor=primary_color,
-                spaceBefore=2*mm,
-                spaceAfter=1*mm,
-            ))
-            
-        except Exception as style_error:
-            print(f"Warning: Error adding styles: {str(style_error)}")
-            # Continue with existing styles
-        
         # Format dates
-        print("Adding business details...")
-        due_date_str = "N/A"
-        if invoice.due_date:
-            try:
-                due_date_str = invoice.due_date.strftime("%d-%m-%Y")
-            except:
-                print("Warning: Could not format due date")
-                due_date_str = str(invoice.due_date)
-        
-        invoice_date_str = "N/A"
-        if invoice.invoice_date:
-            try:
-                invoice_date_str = invoice.invoice_date.strftime("%d-%m-%Y")
-            except:
-                print("Warning: Could not format invoice date")
-                invoice_date_str = str(invoice.invoice_date)
+        logger.debug("Adding business details")
+        due_date_str = _format_date(invoice.due_date)
+        invoice_date_str = _format_date(invoice.invoice_date)
         
         # Create a professional header with company name and document type
         # Add a colored background header bar
         header_data = [[
-            Paragraph(f'<b>{business_profile.name.upper()}</b>', styles.get('InvoiceTitle', styles['Heading1'])),
-            Paragraph('<b>TAX INVOICE</b>', styles.get('InvoiceHeading', styles['Heading2']))
+            Paragraph(f'<b>{business_profile.name.upper()}</b>', title_style),
+            Paragraph('<b>TAX INVOICE</b>', heading_style)
         ]]
         
         header_table = Table(header_data, colWidths=[doc.width * 0.6, doc.width * 0.4])
-        header_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
+        header_table.setStyle(_HEADER_TABLE_STYLE)
         
         elements.append(header_table)
         
         # Add a horizontal line under the header
-        elements.append(Table([['']], colWidths=[doc.width], 
-                             style=TableStyle([
-                                ('LINEBELOW', (0, 0), (-1, 0), 0.5, accent_color),
-                                ('BOTTOMPADDING', (0, 0), (-1, 0), 1),
-                             ])))
+        elements.append(Table([['']], colWidths=[doc.width], style=_HEADER_RULE_STYLE))
         elements.append(Spacer(1, 2*mm))
         
         # Create a 2-column layout for business and customer info to save space
         # Left column: Business info, Right column: Customer info
         business_info = [
-            [Paragraph('<b>FROM:</b>', styles.get('SectionTitle', styles['Normal'])), 
-             Paragraph('<b>TO:</b>', styles.get('SectionTitle', styles['Normal']))],
-            [Paragraph(f'<b>{business_profile.name}</b>', styles.get('InvoiceBold', styles['Normal'])),
-             Paragraph(f'<b>{customer.name}</b>', styles.get('InvoiceBold', styles['Normal']))],
-            [Paragraph(f'<b>GSTIN:</b> {business_profile.gstin}', styles.get('InvoiceNormal', styles['Normal'])),
-             Paragraph(f'<b>GSTIN:</b> {customer.gstin if customer.gstin else "N/A"}', styles.get('InvoiceNormal', styles['Normal']))],
-            [Paragraph(f'{business_profile.address}', styles.get('InvoiceNormal', styles['Normal'])),
-             Paragraph(f'{customer.address}', styles.get('InvoiceNormal', styles['Normal']))],
-            [Paragraph(f'{business_profile.state}', styles.get('InvoiceNormal', styles['Normal'])),
-             Paragraph(f'{customer.state}', styles.get('InvoiceNormal', styles['Normal']))],
+            [Paragraph('<b>FROM:</b>', section_style), 
+             Paragraph('<b>TO:</b>', section_style)],
+            [Paragraph(f'<b>{business_profile.name}</b>', bold_style),
+             Paragraph(f'<b>{customer.name}</b>', bold_style)],
+            [Paragraph(f'<b>GSTIN:</b> {business_profile.gstin}', normal_style),
+             Paragraph(f'<b>GSTIN:</b> {customer.gstin if customer.gstin else "N/A"}', normal_style)],
+            [Paragraph(f'{business_profile.address}', normal_style),
+             Paragraph(f'{customer.address}', normal_style)],
+            [Paragraph(f'{business_profile.state}', normal_style),
+             Paragraph(f'{customer.state}', normal_style)],
         ]
         
         # Create a table with a light background for the business and customer info
         contact_table = Table(business_info, colWidths=[doc.width/2, doc.width/2])
-        contact_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('BACKGROUND', (0, 0), (0, 0), light_color),  # Background for "FROM" header
-            ('BACKGROUND', (1, 0), (1, 0), light_color),  # Background for "TO" header
-        ]))
+        contact_table.setStyle(_CONTACT_TABLE_STYLE)
         
         elements.append(contact_table)
         elements.append(Spacer(1, 3*mm))
         
         # Invoice details in a compact format
         invoice_details = [
-            [Paragraph('<b>INVOICE DETAILS</b>', styles.get('SectionTitle', styles['Normal']))],
+            [Paragraph('<b>INVOICE DETAILS</b>', section_style)],
             [Paragraph(f'<b>Invoice #:</b> {invoice.invoice_number} &nbsp;&nbsp; <b>Date:</b> {invoice_date_str} &nbsp;&nbsp; <b>Due Date:</b> {due_date_str}', 
-                      styles.get('InvoiceNormal', styles['Normal']))],
+                      normal_style)],
         ]
         
         if hasattr(invoice, 'reference_number') and invoice.reference_number:
             invoice_details.append([Paragraph(f'<b>Reference:</b> {invoice.reference_number}', 
-                                            styles.get('InvoiceNormal', styles['Normal']))])
+                                            normal_style)])
         
         invoice_table = Table(invoice_details, colWidths=[doc.width])
-        invoice_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('BACKGROUND', (0, 0), (0, 0), light_color),  # Background for header
-        ]))
+        invoice_table.setStyle(_INVOICE_DETAILS_STYLE)
         
         elements.append(invoice_table)
         elements.append(Spacer(1, 3*mm))
         
         # Invoice items
-        print("Adding invoice items...")
+        logger.debug("Adding invoice items")
         try:
             tax_type = invoice.tax_type
             if not tax_type:
-                print("Warning: Tax type is missing, defaulting to CGST_SGST")
+                logger.warning("Tax type is missing, defaulting to CGST_SGST")
                 tax_type = TaxType.CGST_SGST
         except Exception as e:
-            print(f"Error getting tax type: {str(e)}")
+            logger.warning("Error getting tax type: %s", e)
             tax_type = TaxType.CGST_SGST
         
         # Add section title for items
-        elements.append(Paragraph('<b>INVOICE ITEMS</b>', styles.get('SectionTitle', styles['Normal'])))
+        elements.append(Paragraph('<b>INVOICE ITEMS</b>', section_style))
         elements.append(Spacer(1, 1*mm))
         
-        # Create better-looking headers with professional styling
+        # Header row, row builder and column widths are picked once for this tax type
         if tax_type == TaxType.IGST:
-            item_headers = ['#', 'Item', 'HSN', 'Qty', 'Rate', 'Amount', 'IGST %', 'IGST', 'Total']
+            item_data = [list(_IGST_HEADER_CELLS)]
+            build_row = _igst_item_row
+            col_widths = _IGST_COL_WIDTHS
         else:  # CGST_SGST
-            item_headers = ['#', 'Item', 'HSN', 'Qty', 'Rate', 'Amount', 'CGST %', 'CGST', 'SGST %', 'SGST', 'Total']
-        
-        # Create an array of header cells with proper style
-        styled_headers = []
-        for header in item_headers:
-            styled_headers.append(Paragraph(f'<b>{header}</b>', styles.get('InvoiceBold', styles['Normal'])))
+            item_data = [list(_CGST_SGST_HEADER_CELLS)]
+            build_row = _cgst_sgst_item_row
+            col_widths = _CGST_SGST_COL_WIDTHS
+        error_padding = [""] * (len(item_data[0]) - 2)
         
-        item_data = [styled_headers]
+        # Width left for item text once the cell's default 6pt side padding is taken
+        desc_width = col_widths[1] - 12
         
         for idx, (item, product) in enumerate(items, 1):
             try:
                 # Safely get product attributes
-                product_name = product.name if hasattr(product, 'name') and product.name else "Product"
-                product_hsn = product.hsn_sac if hasattr(product, 'hsn_sac') and product.hsn_sac else "N/A"
-                product_unit = product.unit if hasattr(product, 'unit') and product.unit else ""
+                product_name = product.name or "Product"
+                product_hsn = product.hsn_sac or "N/A"
+                product_unit = product.unit or ""
                 
-                # Safely get item attributes with defaults
-                try:
-                    quantity = float(item.quantity) if hasattr(item, 'quantity') else 0
-                except (TypeError, ValueError):
-                    print(f"Warning: Invalid quantity for item {idx}")
-                    quantity = 0
-                    
-                try:
-                    rate = float(item.rate) if hasattr(item, 'rate') else 0
-                except (TypeError, ValueError):
-                    print(f"Warning: Invalid rate for item {idx}")
-                    rate = 0
-                    
-                try:
-                    subtotal = float(item.subtotal) if hasattr(item, 'subtotal') else 0
-                except (TypeError, ValueError):
-                    print(f"Warning: Invalid subtotal for item {idx}")
-                    subtotal = quantity * rate
-                    
-                try:
-                    tax_rate = float(item.tax_rate) if hasattr(item, 'tax_rate') else 0
-                except (TypeError, ValueError):
-                    print(f"Warning: Invalid tax rate for item {idx}")
-                    tax_rate = 0
-                    
-                try:
-                    item_total = float(item.total) if hasattr(item, 'total') else 0
-                except (TypeError, ValueError):
-                    print(f"Warning: Invalid total for item {idx}")
-                    # Calculate a reasonable default
-                    item_total = subtotal * (1 + tax_rate/100)
+                # Safely get item amounts with defaults
+                quantity, rate, subtotal, tax_rate, item_total, cgst, sgst, igst = _coerce_item(item)
                 
-                # Get tax amounts with safe defaults
-                try: 
-                    cgst = float(item.cgst) if hasattr(item, 'cgst') else 0
-                except (TypeError, ValueError):
-                    cgst = subtotal * (tax_rate/200)
-                    
-                try:
-                    sgst = float(item.sgst) if hasattr(item, 'sgst') else 0
-                except (TypeError, ValueError):
-                    sgst = subtotal * (tax_rate/200)
-                    
-                try:
-                    igst = float(item.igst) if hasattr(item, 'igst') else 0
-                except (TypeError, ValueError):
-                    igst = subtotal * (tax_rate/100)
-                
-                # Create a product description that includes any additional description if available
-                product_description = product_name
-                if hasattr(item, 'description') and item.description:
-                    # Limit description length to prevent layout issues
-                    short_desc = item.description[:50] + "..." if len(item.description) > 50 else item.description
-                    product_description = f"{product_name}<br/><font size='7'>{short_desc}</font>"
-                elif hasattr(product, 'description') and product.description:
-                    # Limit description length to prevent layout issues
-                    short_desc = product.description[:50] + "..." if len(product.description) > 50 else product.description
-                    product_description = f"{product_name}<br/><font size='7'>{short_desc}</font>"
-                
-                if tax_type == TaxType.IGST:
-                    row = [
-                        str(idx),
-                        Paragraph(product_description, styles.get('InvoiceNormal', styles['Normal'])),
-                        product_hsn,
-                        f"{quantity} {product_unit}",
-                        f"{rate:.2f}",
-                        f"{subtotal:.2f}",
-                        f"{tax_rate:.1f}%",
-                        f"{igst:.2f}",
-                        Paragraph(f"<b>{item_total:.2f}</b>", styles.get('InvoiceBold', styles['Normal'])),
-                    ]
-                else:  # CGST_SGST
-                    row = [
-                        str(idx),
-                        Paragraph(product_description, styles.get('InvoiceNormal', styles['Normal'])),
-                        product_hsn,
-                        f"{quantity} {product_unit}",
-                        f"{rate:.2f}",
-                        f"{subtotal:.2f}",
-                        f"{tax_rate/2:.1f}%",
-                        f"{cgst:.2f}",
-                        f"{tax_rate/2:.1f}%",
-                        f"{sgst:.2f}",
-                        Paragraph(f"<b>{item_total:.2f}</b>", styles.get('InvoiceBold', styles['Normal'])),
-                    ]
+                # Create a product description that includes any additional description if available;
+                # only cells with markup or a name too wide for the column need a Paragraph
+                description = item.description or product.description
+                if description:
+                    product_description = Paragraph(_desc_html(product_name, description), normal_style)
+                elif stringWidth(product_name, 'Helvetica', 8) <= desc_width:
+                    product_description = product_name
+                else:
+                    product_description = Paragraph(product_name, normal_style)
                 
-                item_data.append(row)
+                item_data.append(build_row(
+                    idx, product_description, product_hsn, quantity, product_unit,
+                    rate, subtotal, tax_rate, cgst, sgst, igst, item_total,
+                ))
             except Exception as item_error:
-                print(f"Error processing item {idx}: {str(item_error)}")
+                logger.warning("Error processing item %s: %s", idx, item_error)
                 # Add a placeholder row to avoid breaking the table
-                if tax_type == TaxType.IGST:
-                    item_data.append([str(idx), "Error processing item", "", "", "", "", "", "", ""])
-                else:
-                    item_data.append([str(idx), "Error processing item", "", "", "", "", "", "", "", "", ""])
-        
-        print(f"Created data for {len(item_data)-1} items")
+                item_data.append([str(idx), "Error processing item"] + error_padding)
         
-        # Set column widths based on tax type - make more compact
-        if tax_type == TaxType.IGST:
-            col_widths = [
-                12,                    # Item number column
-                doc.width * 0.28,      # Item description
-                doc.width * 0.08,      # HSN/SAC
-                doc.width * 0.07,      # Qty
-                doc.width * 0.07,      # Rate
-                doc.width * 0.09,      # Amount
-                doc.width * 0.06,      # IGST %
-                doc.width * 0.09,      # IGST
-                doc.width * 0.10,      # Total
-            ]
-        else:
-            col_widths = [
-                12,                    # Item number column
-                doc.width * 0.24,      # Item description
-                doc.width * 0.07,      # HSN/SAC
-                doc.width * 0.06,      # Qty
-                doc.width * 0.06,      # Rate
-                doc.width * 0.08,      # Amount
-                doc.width * 0.05,      # CGST %
-                doc.width * 0.07,      # CGST
-                doc.width * 0.05,      # SGST %
-                doc.width * 0.07,      # SGST
-                doc.width * 0.09,      # Total
-            ]
+        logger.debug("Created data for %d items", len(item_data) - 1)
         
         # Create items table with improved styling and height limits
-        items_table = Table(item_data, colWidths=col_widths, repeatRows=1)
-        
-        # Define the table style with alternating row colors and better borders
-        table_style = [
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 3),
-            ('TOPPADDING', (0, 0), (-1, 0), 3),
-            
-            # Content styling
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # Center the item numbers
-            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),  # Right align numeric columns
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Grid styling - more subtle borders
-            ('GRID', (0, 0), (-1, -1), 0.5, border_color),
-            ('LINEBELOW', (0, 0), (-1, 0), 0.5, primary_color),  # Thicker line below header
-            
-            # Row padding - reduce padding to make more compact
-            ('TOPPADDING', (0, 1), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
-        ]
+        # LongTable stops measuring rows once a page is full when splitting
+        items_table = LongTable(item_data, colWidths=col_widths, repeatRows=1)
         
-        # Add alternating row colors for better readability
-        for i in range(1, len(item_data)):
-            if i % 2 == 0:
-                table_style.append(('BACKGROUND', (0, i), (-1, i), light_color))
-        
-        # Apply the style
-        items_table.setStyle(TableStyle(table_style))
-        
-        # Wrap the table in a try-except to handle potential layout errors
-        try:
-            # Limit the maximum height of each row to prevent layout errors
-            for i, row in enumerate(item_data):
-                for j, cell in enumerate(row):
-                    if isinstance(cell, Paragraph):
-                        # Limit paragraph height
-                        cell.wrapOn(doc, col_widths[j], 30*mm)
-            
-            elements.append(items_table)
-        except Exception as table_error:
-            print(f"Warning: Error with items table: {str(table_error)}")
-            # Create a simpler table as fallback
-            simple_headers = ['#', 'Item', 'Qty', 'Rate', 'Amount', 'Tax', 'Total']
-            simple_data = [simple_headers]
-            
-            for idx, (item, product) in enumerate(items, 1):
-                product_name = product.name if hasattr(product, 'name') and product.name else "Product"
-                quantity = float(item.quantity) if hasattr(item, 'quantity') else 0
-                rate = float(item.rate) if hasattr(item, 'rate') else 0
-                subtotal = float(item.subtotal) if hasattr(item, 'subtotal') else 0
-                tax_amount = float(item.tax_amount) if hasattr(item, 'tax_amount') else 0
-                item_total = float(item.total) if hasattr(item, 'total') else 0
-                
-                simple_data.append([
-                    str(idx),
-                    product_name,
-                    f"{quantity}",
-                    f"{rate:.2f}",
-                    f"{subtotal:.2f}",
-                    f"{tax_amount:.2f}",
-                    f"{item_total:.2f}",
-                ])
-            
-            simple_table = Table(simple_data, repeatRows=1)
-            simple_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 0.5, border_color),
-            ]))
-            
-            elements.append(simple_table)
+        # Apply the table style with alternating row colors and better borders
+        items_table.setStyle(_ITEMS_TABLE_STYLE)
         
+        elements.append(items_table)
         elements.append(Spacer(1, 3*mm))
         
         # Tax summary with better formatting
-        print("Adding tax summary...")
+        logger.debug("Adding tax summary")
         try:
             subtotal_value = float(invoice.subtotal) if hasattr(invoice, 'subtotal') and invoice.subtotal is not None else 0
         except (TypeError, ValueError):
-            print("Warning: Invalid subtotal value")
+            logger.warning("Invalid subtotal value")
             subtotal_value = 0
         
         # Initialize tax values    
@@ -641,22 +772,24 @@ def generate_invoice_pdf(
         sgst_total = 0
         igst_total = 0
         
-        # Get tax values safely
+        # Get tax values safely; the summary rows for this tax type are collected alongside
         if tax_type == TaxType.CGST_SGST:
             try:
                 cgst_total = float(invoice.cgst_total) if hasattr(invoice, 'cgst_total') and invoice.cgst_total is not None else 0
             except (TypeError, ValueError):
-                print("Warning: Invalid CGST value")
+                logger.warning("Invalid CGST value")
                 
             try:
                 sgst_total = float(invoice.sgst_total) if hasattr(invoice, 'sgst_total') and invoice.sgst_total is not None else 0
             except (TypeError, ValueError):
-                print("Warning: Invalid SGST value")
+                logger.warning("Invalid SGST value")
+            tax_rows = [('CGST:', cgst_total), ('SGST:', sgst_total)]
         else:
             try:
                 igst_total = float(invoice.igst_total) if hasattr(invoice, 'igst_total') and invoice.igst_total is not None else 0
             except (TypeError, ValueError):
-                print("Warning: Invalid IGST value")
+                logger.warning("Invalid IGST value")
+            tax_rows = [('IGST:', igst_total)]
         
         # Get discount amount if available
         discount_amount = 0
@@ -664,7 +797,7 @@ def generate_invoice_pdf(
             if hasattr(invoice, 'discount_amount') and invoice.discount_amount is not None:
                 discount_amount = float(invoice.discount_amount)
         except (TypeError, ValueError):
-            print("Warning: Invalid discount amount")
+            logger.warning("Invalid discount amount")
         
         # Get round-off amount if available
         round_off = 0
@@ -672,230 +805,130 @@ def generate_invoice_pdf(
             if hasattr(invoice, 'round_off') and invoice.round_off is not None:
                 round_off = float(invoice.round_off)
         except (TypeError, ValueError):
-            print("Warning: Invalid round-off amount")
+            logger.warning("Invalid round-off amount")
         
         # Calculate total
         try:
             total_value = float(invoice.total) if hasattr(invoice, 'total') and invoice.total is not None else 0
         except (TypeError, ValueError):
-            print("Warning: Invalid total value")
+            logger.warning("Invalid total value")
             # Calculate a reasonable default
-            if tax_type == TaxType.CGST_SGST:
-                total_value = subtotal_value + cgst_total + sgst_total - discount_amount + round_off
-            else:
-                total_value = subtotal_value + igst_total - discount_amount + round_off
+            total_value = subtotal_value + cgst_total + sgst_total + igst_total - discount_amount + round_off
         
         # Add section title for summary
-        elements.append(Paragraph('<b>INVOICE SUMMARY</b>', styles.get('SectionTitle', styles['Normal'])))
+        elements.append(Paragraph('<b>INVOICE SUMMARY</b>', section_style))
         elements.append(Spacer(1, 1*mm))
         
-        # Creating a more professional-looking summary section
-        summary_data = [
-            ['Subtotal:', Paragraph(f'₹{subtotal_value:.2f}', styles.get('InvoiceRight', styles['Normal']))],
-        ]
-        
-        # Add appropriate tax rows
-        if tax_type == TaxType.CGST_SGST:
-            summary_data.extend([
-                ['CGST:', Paragraph(f'₹{cgst_total:.2f}', styles.get('InvoiceRight', styles['Normal']))],
-                ['SGST:', Paragraph(f'₹{sgst_total:.2f}', styles.get('InvoiceRight', styles['Normal']))],
-            ])
-        else:
-            summary_data.append(['IGST:', Paragraph(f'₹{igst_total:.2f}', styles.get('InvoiceRight', styles['Normal']))])
-        
-        # Add discount if present
+        # Optional discount and round-off rows, only when present
+        extra_rows = []
         if discount_amount > 0:
-            summary_data.append(['Discount:', Paragraph(f'₹{discount_amount:.2f}', styles.get('InvoiceRight', styles['Normal']))])
-        
-        # Add round-off if present
+            extra_rows.append(['Discount:', f'₹{discount_amount:.2f}'])
         if round_off != 0:
-            summary_data.append(['Round Off:', Paragraph(f'₹{round_off:.2f}', styles.get('InvoiceRight', styles['Normal']))])
+            extra_rows.append(['Round Off:', f'₹{round_off:.2f}'])
         
-        # Add total with bold styling
-        summary_data.append(['', ''])  # Empty row for spacing
-        summary_data.append([
-            Paragraph('<b>TOTAL:</b>', styles.get('InvoiceTotal', styles['Normal'])),
-            Paragraph(f'<b>₹{total_value:.2f}</b>', styles.get('InvoiceTotal', styles['Normal']))
-        ])
+        # Creating a more professional-looking summary section in one list
+        summary_data = [
+            ['Subtotal:', f'₹{subtotal_value:.2f}'],
+            *[[label, f'₹{amount:.2f}'] for label, amount in tax_rows],
+            *extra_rows,
+            ['', ''],  # Empty row for spacing
+            # Total with bold styling
+            [Paragraph('<b>TOTAL:</b>', total_style), Paragraph(f'<b>₹{total_value:.2f}</b>', total_style)],
+        ]
         
         # Format the summary table with a professional look
         summary_table = Table(summary_data, colWidths=[doc.width * 0.7, doc.width * 0.3])
-        summary_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ('LINEABOVE', (0, -1), (1, -1), 0.5, primary_color),  # Line above total
-            ('TOPPADDING', (0, -1), (1, -1), 3),  # Extra padding for total
-            ('BOTTOMPADDING', (0, -1), (1, -1), 3),  # Extra padding for total
-            ('BACKGROUND', (0, -1), (1, -1), light_color),  # Background color for total row
-        ]))
+        summary_table.setStyle(_SUMMARY_TABLE_STYLE)
         
         elements.append(summary_table)
         elements.append(Spacer(1, 3*mm))
         
         # Add amount in words in a more compact format
         amount_in_words = num_to_words(total_value)
-        elements.append(Paragraph(f'<b>Amount in Words:</b> {amount_in_words} Rupees Only', styles.get('InvoiceSmall', styles['Normal'])))
+        elements.append(Paragraph(f'<b>Amount in Words:</b> {amount_in_words} Rupees Only', small_style))
         elements.append(Spacer(1, 3*mm))
         
         # Notes section if available - make more compact
         if hasattr(invoice, 'notes') and invoice.notes:
-            print("Adding notes...")
-            elements.append(Paragraph('<b>NOTES:</b>', styles.get('SectionTitle', styles['Normal'])))
+            logger.debug("Adding notes")
+            elements.append(Paragraph('<b>NOTES:</b>', section_style))
             elements.append(Spacer(1, 1*mm))
             
             # Create a bordered box for notes
-            notes_table = Table([[Paragraph(invoice.notes, styles.get('InvoiceSmall', styles['Normal']))]], 
+            notes_table = Table([[Paragraph(invoice.notes, small_style)]], 
                                colWidths=[doc.width])
-            notes_table.setStyle(TableStyle([
-                ('BOX', (0, 0), (-1, -1), 0.5, border_color),
-                ('BACKGROUND', (0, 0), (-1, -1), light_color),
-                ('TOPPADDING', (0, 0), (-1, -1), 3),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ]))
+            notes_table.setStyle(_NOTES_TABLE_STYLE)
             
             elements.append(notes_table)
             elements.append(Spacer(1, 3*mm))
         
         # Add payment terms and bank details if available - make more compact
-        payment_info = []
-        if hasattr(business_profile, 'bank_name') and business_profile.bank_name:
-            payment_info.append(Paragraph('<b>BANK DETAILS:</b>', styles.get('InvoiceSmall', styles['Normal'])))
-            if hasattr(business_profile, 'bank_name'):
-                payment_info.append(Paragraph(f'<b>Bank:</b> {business_profile.bank_name}', styles.get('InvoiceSmall', styles['Normal'])))
-            if hasattr(business_profile, 'account_number'):
-                payment_info.append(Paragraph(f'<b>Account No:</b> {business_profile.account_number}', styles.get('InvoiceSmall', styles['Normal'])))
-            if hasattr(business_profile, 'ifsc_code'):
-                payment_info.append(Paragraph(f'<b>IFSC Code:</b> {business_profile.ifsc_code}', styles.get('InvoiceSmall', styles['Normal'])))
+        bp_bank = getattr(business_profile, 'bank_name', None)
+        if bp_bank:
+            bp_acct = getattr(business_profile, 'account_number', None)
+            bp_ifsc = getattr(business_profile, 'ifsc_code', None)
+            
+            # One paragraph with line breaks instead of a table row per field
+            payment_lines = ['<b>BANK DETAILS:</b>', f'<b>Bank:</b> {bp_bank}']
+            if bp_acct:
+                payment_lines.append(f'<b>Account No:</b> {bp_acct}')
+            if bp_ifsc:
+                payment_lines.append(f'<b>IFSC Code:</b> {bp_ifsc}')
             
             # Add payment info in a bordered box
-            if payment_info:
-                payment_table = Table([[item] for item in payment_info], colWidths=[doc.width * 0.5])
-                payment_table.setStyle(TableStyle([
-                    ('BOX', (0, 0), (-1, -1), 0.5, border_color),
-                    ('BACKGROUND', (0, 0), (0, 0), light_color),  # Only color the header
-                    ('TOPPADDING', (0, 0), (-1, -1), 2),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-                ]))
-                elements.append(payment_table)
-                elements.append(Spacer(1, 3*mm))
+            payment_table = Table([[Paragraph('<br/>'.join(payment_lines), small_style)]],
+                                  colWidths=[doc.width * 0.5])
+            payment_table.setStyle(_PAYMENT_TABLE_STYLE)
+            elements.append(payment_table)
+            elements.append(Spacer(1, 3*mm))
         
         # Footer with thank you note and signature - make more compact
-        print("Adding footer...")
-        elements.append(Paragraph('<b>THANK YOU FOR YOUR BUSINESS!</b>', styles.get('InvoiceCenter', styles['Normal'])))
+        logger.debug("Adding footer")
+        elements.append(Paragraph('<b>THANK YOU FOR YOUR BUSINESS!</b>', center_style))
         elements.append(Spacer(1, 2*mm))
         
         footer_data = [
-            ['', Paragraph(f'For {business_profile.name}', styles.get('InvoiceRight', styles['Normal']))],
+            ['', f'For {business_profile.name}'],
             ['', ''],
-            ['', Paragraph('<b>Authorized Signatory</b>', styles.get('InvoiceRight', styles['Normal']))],
+            ['', 'Authorized Signatory'],
         ]
         
         footer_table = Table(footer_data, colWidths=[doc.width * 0.6, doc.width * 0.4])
-        footer_table.setStyle(TableStyle([
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
+        footer_table.setStyle(_FOOTER_TABLE_STYLE)
         
         elements.append(footer_table)
         elements.append(Spacer(1, 5*mm))
         
-        # Final footer with company info and disclaimer
-        disclaimer = (
-            "This is a computer-generated invoice and requires no signature. "
-            "Generated by GSTInvoicePro on " + datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-        )
-        elements.append(Table([[Paragraph(disclaimer, styles.get('InvoiceFooter', styles['Normal']))]], 
+        # Final footer with company info and disclaimer; cached renders are replayed
+        # later, so they carry no generation timestamp that would go stale
+        disclaimer = "This is a computer-generated invoice and requires no signature. Generated by GSTInvoicePro"
+        if cache_key is None:
+            disclaimer += " on " + (generation_time or _generation_timestamp())
+        elements.append(Table([[Paragraph(disclaimer, footer_style)]], 
                              colWidths=[doc.width],
-                             style=TableStyle([
-                                 ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-                                 ('LINEABOVE', (0, 0), (0, 0), 0.5, border_color),
-                                 ('TOPPADDING', (0, 0), (0, 0), 3),
-                             ])))
+                             style=_DISCLAIMER_STYLE))
         
         # Build PDF with custom canvas
-        print("Building PDF...")
-        try:
-            # Try to build the PDF with all elements
-            doc.build(elements, canvasmaker=PageCounterCanvas)
-        except Exception as layout_error:
-            print(f"Warning: Layout error in PDF generation: {str(layout_error)}")
-            # If there's a layout error, try a more simplified version
-            try:
-                # Create a simplified version with fewer elements
-                simplified_elements = []
-                
-                # Add only essential elements (header, basic info, summary)
-                for element in elements:
-                    # Skip complex tables and keep only simple elements
-                    if not isinstance(element, Table) or len(element._cellvalues) < 5:
-                        simplified_elements.append(element)
-                
-                # Create a simple note about the simplified version
-                simplified_elements.append(Spacer(1, 5*mm))
-                simplified_elements.append(Paragraph(
-                    "Note: This is a simplified invoice due to layout constraints. Please contact support for a detailed version.",
-                    styles.get('InvoiceSmall', styles['Normal'])
-                ))
-                
-                # Build the simplified PDF
-                doc = SimpleDocTemplate(
-                    buffer,
-                    pagesize=A4,
-                    rightMargin=10*mm,
-                    leftMargin=10*mm,
-                    topMargin=10*mm,
-                    bottomMargin=10*mm,
-                    title=f"Invoice {invoice.invoice_number} (Simplified)"
-                )
-                doc.build(simplified_elements)
-            except Exception as simplified_error:
-                print(f"Error creating simplified PDF: {str(simplified_error)}")
-                # If even the simplified version fails, create an ultra-simple PDF with no styles
-                try:
-                    print("Attempting ultra-simple PDF fallback...")
-                    ultra_buffer = BytesIO()
-                    c = canvas.Canvas(ultra_buffer, pagesize=letter)
-                    c.setFont("Helvetica", 14)
-                    c.drawString(72, 700, "Error Generating Invoice PDF")
-                    c.setFont("Helvetica", 10)
-                    c.drawString(72, 670, "An error occurred while generating the PDF:")
-                    c.drawString(72, 650, str(layout_error)[:100])  # Limit error message length
-                    c.drawString(72, 630, "Please check the server logs for more details.")
-                    c.save()
-                    ultra_pdf = ultra_buffer.getvalue()
-                    ultra_buffer.close()
-                    print("Created ultra-simple PDF fallback")
-                    return ultra_pdf
-                except:
-                    # If even this fails, return a simple error message as PDF
-                    print("Using emergency text-only PDF")
-                    simple_buffer = BytesIO()
-                    simple_buffer.write(b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj 2 0 obj<</Type/Pages/Count 1/Kids[3 0 R]>>endobj 3 0 obj<</Type/Page/MediaBox[0 0 612 792]/Resources<<>>/Contents 4 0 R>>endobj 4 0 obj<</Length 68>>stream\nBT\n/F1 12 Tf\n72 700 Td\n(Error Generating Invoice PDF) Tj\nET\nendstream\nendobj\ntrailer<</Size 5/Root 1 0 R>>\n%%EOF")
-                    simple_pdf = simple_buffer.getvalue()
-                    simple_buffer.close()
-                    return simple_pdf
+        logger.debug("Building PDF")
+        # Layout errors propagate to the error-PDF fallback below
+        doc.build(elements, canvasmaker=partial(PageCounterCanvas, page_width=page_width))
+        
+        logger.debug("PDF generation completed successfully")
+        if out is not None:
+            return None
         
         # Get PDF data from buffer
         pdf_data = buffer.getvalue()
         buffer.close()
-        
-        print("PDF generation completed successfully")
+        _remember_pdf(cache_key, pdf_data)
         return pdf_data
         
     except Exception as e:
-        print(f"Error in generate_invoice_pdf: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in _generate_invoice_pdf_reportlab: %s", e)
         
         # Create a simple error PDF as fallback
         try:
-            print("Attempting to create error fallback PDF...")
+            logger.warning("Attempting to create error fallback PDF")
             error_buffer = BytesIO()
             doc = SimpleDocTemplate(
                 error_buffer,
@@ -923,69 +956,182 @@ def generate_invoice_pdf(
             
             fallback_pdf = error_buffer.getvalue()
             error_buffer.close()
-            print("Created fallback error PDF")
-            return fallback_pdf
+            logger.debug("Created fallback error PDF")
+            return _deliver(fallback_pdf, out)
             
         except Exception as fallback_error:
-            print(f"Critical error creating fallback PDF: {str(fallback_error)}")
-            # If even the fallback fails, create an ultra-simple PDF with no styles
-            try:
-                print("Attempting ultra-simple PDF fallback...")
-                ultra_buffer = BytesIO()
-                c = canvas.Canvas(ultra_buffer, pagesize=letter)
-                c.setFont("Helvetica", 14)
-                c.drawString(72, 700, "Error Generating Invoice PDF")
-                c.setFont("Helvetica", 10)
-                c.drawString(72, 670, "An error occurred while generating the PDF:")
-                c.drawString(72, 650, str(e)[:100])  # Limit error message length
-                c.drawString(72, 630, "Please check the server logs for more details.")
-                c.save()
-                ultra_pdf = ultra_buffer.getvalue()
-                ultra_buffer.close()
-                print("Created ultra-simple PDF fallback")
-                return ultra_pdf
-            except:
-                # If even this fails, return a simple error message as PDF
-                print("Using emergency text-only PDF")
-                simple_buffer = BytesIO()
-                simple_buffer.write(b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj 2 0 obj<</Type/Pages/Count 1/Kids[3 0 R]>>endobj 3 0 obj<</Type/Page/MediaBox[0 0 612 792]/Resources<<>>/Contents 4 0 R>>endobj 4 0 obj<</Length 68>>stream\nBT\n/F1 12 Tf\n72 700 Td\n(Error Generating Invoice PDF) Tj\nET\nendstream\nendobj\ntrailer<</Size 5/Root 1 0 R>>\n%%EOF")
-                simple_pdf = simple_buffer.getvalue()
-                simple_buffer.close()
-                return simple_pdf 
+            logger.error("Critical error creating fallback PDF: %s", fallback_error)
+            return _deliver(_render_error_pdf(str(e)), out)
+
+
+# Rendered PDFs of stored invoices, most recently used last; only successful renders
+# are stored, so error PDFs are never replayed. Per process only: each worker keeps
+# its own copy and the cache is empty after a restart
+_PDF_CACHE: "OrderedDict[str, bytes]" = OrderedDict()
+_PDF_CACHE_SIZE = 128
+_PDF_CACHE_LOCK = threading.Lock()
+
+
+def _row_values(obj) -> tuple:
+    """
+    Column values of a row, in mapper order; plain objects fall back to their attributes
+    """
+    state = sa_inspect(obj, raiseerr=False)
+    if state is None or not hasattr(state, 'mapper'):
+        return tuple(sorted((k, v) for k, v in vars(obj).items() if not k.startswith('_')))
+    return tuple(getattr(obj, attr.key) for attr in state.mapper.column_attrs)
+
+
+def _pdf_cache_key(invoice, business_profile, customer, items) -> Optional[str]:
+    """
+    Digest of the column values of every row printed on the invoice, so any edit to
+    an amount, quantity, name or address gives a new key (updated_at alone is NULL
+    until the first update and only has second resolution)
+    Returns None for unsaved objects (no id), which are never cached
+    """
+    if getattr(invoice, 'id', None) is None:
+        return None
+    parts = (
+        _row_values(invoice),
+        _row_values(business_profile),
+        _row_values(customer),
+        tuple((_row_values(item), _row_values(product)) for item, product in items),
+    )
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def _cached_pdf(cache_key: Optional[str]) -> Optional[bytes]:
+    if cache_key is None:
+        return None
+    with _PDF_CACHE_LOCK:
+        pdf_data = _PDF_CACHE.get(cache_key)
+        if pdf_data is not None:
+            _PDF_CACHE.move_to_end(cache_key)
+        return pdf_data
+
+
+def _remember_pdf(cache_key: Optional[str], pdf_data: Optional[bytes]) -> None:
+    if cache_key is None or not pdf_data:
+        return
+    with _PDF_CACHE_LOCK:
+        _PDF_CACHE[cache_key] = pdf_data
+        _PDF_CACHE.move_to_end(cache_key)
+        while len(_PDF_CACHE) > _PDF_CACHE_SIZE:
+            _PDF_CACHE.popitem(last=False)
+
+
+# Invoice template, compiled once; templates ship with the app and never change at runtime
+_JINJA_ENV = Environment(
+    loader=FileSystemLoader(str(Path(__file__).parent.parent / 'templates')),
+    auto_reload=False,
+    cache_size=50,
+)
+_INVOICE_TEMPLATE = _JINJA_ENV.get_template('invoice.html')
+
+# Custom CSS for better styling of the HTML invoice
+_CSS_CONTENT = """
+@page {
+    size: A4;
+    margin: 1.5cm;
+}
+body {
+    font-family: Arial, sans-serif;
+    font-size: 10pt;
+    color: #202124;
+}
+.invoice-box {
+    max-width: 800px;
+    margin: auto;
+    padding: 20px;
+    border: 1px solid #eee;
+    box-shadow: 0 0 10px rgba(0, 0, 0, 0.15);
+    font-size: 10pt;
+    line-height: 1.2;
+}
+.invoice-header {
+    display: flex;
+    justify-content: space-between;
+    margin-bottom: 20px;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-bottom: 15px;
+}
+table th {
+    background-color: #4285F4;
+    color: white;
+    font-weight: bold;
+    padding: 5px;
+    text-align: left;
+    font-size: 9pt;
+}
+table td {
+    padding: 5px;
+    border-bottom: 1px solid #eee;
+    font-size: 9pt;
+}
+table tr:nth-child(even) {
+    background-color: #f8f9fa;
+}
+.total {
+    font-weight: bold;
+    font-size: 11pt;
+    text-align: right;
+}
+.amount-in-words {
+    font-style: italic;
+    font-size: 9pt;
+    margin-bottom: 10px;
+}
+.footer {
+    margin-top: 20px;
+    text-align: center;
+    color: #777;
+    font-size: 8pt;
+}"""
+
+
+# WeasyPrint is optional and not in requirements; probed once at import so the
+# default path goes straight to ReportLab instead of failing imports per render
+try:
+    from weasyprint import HTML as _WEASYPRINT_HTML
+except (ImportError, OSError):
+    _WEASYPRINT_HTML = None
+
+
+@lru_cache(maxsize=1)
+def _weasyprint_resources():
+    """
+    Parse the invoice stylesheet and build the font configuration on first use
+    Raises ImportError when WeasyPrint is not installed
+    """
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    return CSS(string=_CSS_CONTENT, font_config=font_config), font_config
 
 
 def generate_invoice_pdf_html(
     invoice: Invoice,
     business_profile: BusinessProfile,
     customer: Customer,
-    items: List[Tuple[InvoiceItem, Product]]
-) -> bytes:
+    items: List[Tuple[InvoiceItem, Product]],
+    generation_time: Optional[str] = None,
+    out: Optional[BinaryIO] = None,
+    cache_key: Optional[str] = None
+) -> Optional[bytes]:
     """
     Generate PDF from invoice data using HTML/CSS via WeasyPrint
     This provides a more reliable and easier to maintain alternative to ReportLab
     """
     try:
-        print("Initializing HTML-based PDF generation...")
-        
-        # Load the HTML template
-        template_dir = Path(__file__).parent.parent / 'templates'
-        env = Environment(loader=FileSystemLoader(str(template_dir)))
-        template = env.get_template('invoice.html')
+        logger.debug("Initializing HTML-based PDF generation")
         
         # Format dates
-        invoice_date_str = "N/A"
-        if invoice.invoice_date:
-            try:
-                invoice_date_str = invoice.invoice_date.strftime("%d-%m-%Y")
-            except:
-                invoice_date_str = str(invoice.invoice_date)
-                
-        due_date_str = "N/A"
-        if invoice.due_date:
-            try:
-                due_date_str = invoice.due_date.strftime("%d-%m-%Y")
-            except:
-                due_date_str = str(invoice.due_date)
+        invoice_date_str = _format_date(invoice.invoice_date)
+        due_date_str = _format_date(invoice.due_date)
         
         # Calculate amount in words
         total_value = float(invoice.total) if hasattr(invoice, 'total') and invoice.total is not None else 0
@@ -998,88 +1144,24 @@ def generate_invoice_pdf_html(
             'customer': customer,
             'items': items,
             'amount_in_words': amount_in_words,
-            'generation_time': datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+            'generation_time': generation_time or _generation_timestamp()
         }
         
         # Render HTML
-        html_content = template.render(**context)
+        html_content = _INVOICE_TEMPLATE.render(**context)
         
         try:
             # Try to use WeasyPrint if available
-            from weasyprint import HTML, CSS
-            from weasyprint.text.fonts import FontConfiguration
-            
-            # Add custom CSS for better styling
-            css_content = """
-            @page {
-                size: A4;
-                margin: 1.5cm;
-            }
-            body {
-                font-family: Arial, sans-serif;
-                font-size: 10pt;
-                color: #202124;
-            }
-            .invoice-box {
-                max-width: 800px;
-                margin: auto;
-                padding: 20px;
-                border: 1px solid #eee;
-                box-shadow: 0 0 10px rgba(0, 0, 0, 0.15);
-                font-size: 10pt;
-                line-height: 1.2;
-            }
-            .invoice-header {
-                display: flex;
-                justify-content: space-between;
-                margin-bottom: 20px;
-            }
-            table {
-                width: 100%;
-                border-collapse: collapse;
-                margin-bottom: 15px;
-            }
-            table th {
-                background-color: #4285F4;
-                color: white;
-                font-weight: bold;
-                padding: 5px;
-                text-align: left;
-                font-size: 9pt;
-            }
-            table td {
-                padding: 5px;
-                border-bottom: 1px solid #eee;
-                font-size: 9pt;
-            }
-            table tr:nth-child(even) {
-                background-color: #f8f9fa;
-            }
-            .total {
-                font-weight: bold;
-                font-size: 11pt;
-                text-align: right;
-            }
-            .amount-in-words {
-                font-style: italic;
-                font-size: 9pt;
-                margin-bottom: 10px;
-            }
-            .footer {
-                margin-top: 20px;
-                text-align: center;
-                color: #777;
-                font-size: 8pt;
-            }
-            """
+            if _WEASYPRINT_HTML is None:
+                raise ImportError("WeasyPrint is not installed")
             
-            font_config = FontConfiguration()
-            html = HTML(string=html_content)
-            css = CSS(string=css_content)
+            css, font_config = _weasyprint_resources()
+            html = _WEASYPRINT_HTML(string=html_content)
             
-            # Generate PDF
-            pdf_content = html.write_pdf(stylesheets=[css], font_config=font_config)
-            print(f"HTML-based PDF generated successfully, size: {len(pdf_content)} bytes")
+            # Generate PDF, straight into the caller's sink when one was given
+            pdf_content = html.write_pdf(target=out, stylesheets=[css], font_config=font_config)
+            logger.debug("HTML-based PDF generated successfully")
+            _remember_pdf(cache_key, pdf_content)
             return pdf_content
             
         except ImportError:
@@ -1088,26 +1170,85 @@ def generate_invoice_pdf_html(
                 import xhtml2pdf.pisa as pisa
                 
                 # Create PDF
-                pdf_buffer = BytesIO()
+                pdf_buffer = out if out is not None else BytesIO()
                 pisa.CreatePDF(html_content, dest=pdf_buffer)
+                
+                logger.debug("xhtml2pdf-based PDF generated successfully")
+                if out is not None:
+                    return None
                 pdf_content = pdf_buffer.getvalue()
                 pdf_buffer.close()
-                
-                print(f"xhtml2pdf-based PDF generated successfully, size: {len(pdf_content)} bytes")
+                _remember_pdf(cache_key, pdf_content)
                 return pdf_content
                 
             except ImportError:
                 # If xhtml2pdf is not available, fall back to ReportLab
-                print("HTML PDF libraries not available, falling back to ReportLab")
-                return generate_invoice_pdf(invoice, business_profile, customer, items)
+                logger.debug("HTML PDF libraries not available, falling back to ReportLab")
+                return _generate_invoice_pdf_reportlab(invoice, business_profile, customer, items, generation_time, out, cache_key)
                 
     except Exception as e:
-        print(f"Error in generate_invoice_pdf_html: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in generate_invoice_pdf_html: %s", e)
         
         # Fall back to ReportLab if HTML generation fails
-        return generate_invoice_pdf(invoice, business_profile, customer, items)
+        return _generate_invoice_pdf_reportlab(invoice, business_profile, customer, items, generation_time, out, cache_key)
+
+
+def generate_invoice_pdf(
+    invoice: Invoice,
+    business_profile: BusinessProfile,
+    customer: Customer,
+    items: List[Tuple[InvoiceItem, Product]],
+    generation_time: Optional[str] = None,
+    out: Optional[BinaryIO] = None
+) -> Optional[bytes]:
+    """
+    Generate the invoice PDF with ReportLab, or with the HTML/CSS renderer when
+    WeasyPrint is installed
+
+    Pass generation_time to stamp a batch of invoices with one shared timestamp.
+    Pass out (a writable binary file) to stream the PDF into it instead of
+    returning bytes; the function then returns None.
+
+    Stored invoices are served from the rendered-PDF cache until the invoice, its
+    items, products, customer or business profile change.
+    """
+    cache_key = None
+    if generation_time is None and out is None:
+        cache_key = _pdf_cache_key(invoice, business_profile, customer, items)
+        cached_pdf = _cached_pdf(cache_key)
+        if cached_pdf is not None:
+            return cached_pdf
+    
+    if _WEASYPRINT_HTML is not None:
+        return generate_invoice_pdf_html(invoice, business_profile, customer, items, generation_time, out, cache_key)
+    return _generate_invoice_pdf_reportlab(invoice, business_profile, customer, items, generation_time, out, cache_key)
+
+
+# IRP item entry with its constant fields filled in; copied per line item
+_ITEM_TEMPLATE = {
+    "SlNo": "",
+    "PrdDesc": "",
+    "IsServc": "N",
+    "HsnCd": "",
+    "Qty": 0.0,
+    "Unit": "NOS",
+    "UnitPrice": 0.0,
+    "TotAmt": 0.0,
+    "Discount": 0,  # Default to 0
+    "AssAmt": 0.0,
+    "GstRt": 0.0,
+    "IgstAmt": 0.0,
+    "CgstAmt": 0.0,
+    "SgstAmt": 0.0,
+    "CesRt": 0,  # Cess rate - default to 0
+    "CesAmt": 0,  # Cess amount - default to 0
+    "CesNonAdvlAmt": 0,  # Non-advaloram cess - default to 0
+    "StateCesRt": 0,  # State cess rate - default to 0
+    "StateCesAmt": 0,  # State cess amount - default to 0
+    "StateCesNonAdvlAmt": 0,  # State non-advaloram cess - default to 0
+    "OthChrg": 0,  # Other charges - default to 0
+    "TotItemVal": 0.0,
+}
 
 
 def generate_gst_irp_json(
@@ -1164,18 +1305,38 @@ def generate_gst_irp_json(
             "Dt": invoice_date_str
         }
         
+        # Split each address once: first line, then the rest joined on one line
+        seller_addr = (business_profile.address or "").split('\n', 1)
+        seller_addr1 = seller_addr[0]
+        seller_addr2 = seller_addr[1].replace('\n', ' ') if len(seller_addr) > 1 else ""
+        buyer_addr = (customer.address or "").split('\n', 1)
+        buyer_addr1 = buyer_addr[0]
+        buyer_addr2 = buyer_addr[1].replace('\n', ' ') if len(buyer_addr) > 1 else ""
+        
+        # Get state codes from state names
+        seller_state_code = get_state_code(business_profile.state)
+        buyer_state_code = get_state_code(customer.state)
+        
+        # Snapshot optional contact fields once; business profiles store the PIN as 'pin'
+        bp_pin = getattr(business_profile, 'pincode', None) or getattr(business_profile, 'pin', "")
+        bp_phone = getattr(business_profile, 'phone', "")
+        bp_email = getattr(business_profile, 'email', "")
+        cust_pin = getattr(customer, 'pincode', "")
+        cust_phone = getattr(customer, 'phone', "")
+        cust_email = getattr(customer, 'email', "")
+        
         # Get seller (business) details
         seller_details = {
             "Gstin": business_profile.gstin,
             "LglNm": business_profile.name,
             "TrdNm": business_profile.name,  # Trade name, using the same as legal name
-            "Addr1": business_profile.address.split('\n')[0] if business_profile.address else "",
-            "Addr2": " ".join(business_profile.address.split('\n')[1:]) if business_profile.address and len(business_profile.address.split('\n')) > 1 else "",
+            "Addr1": seller_addr1,
+            "Addr2": seller_addr2,
             "Loc": business_profile.state,
-            "Pin": business_profile.pincode if hasattr(business_profile, 'pincode') else "",
-            "Stcd": get_state_code(business_profile.state),  # Get state code from state name
-            "Ph": business_profile.phone if hasattr(business_profile, 'phone') else "",
-            "Em": business_profile.email if hasattr(business_profile, 'email') else ""
+            "Pin": bp_pin,
+            "Stcd": seller_state_code,
+            "Ph": bp_phone,
+            "Em": bp_email
         }
         
         # Get buyer (customer) details
@@ -1183,64 +1344,51 @@ def generate_gst_irp_json(
             "Gstin": customer.gstin if customer.gstin else "URP",  # URP for unregistered person
             "LglNm": customer.name,
             "TrdNm": customer.name,  # Trade name, using the same as legal name
-            "Pos": get_state_code(customer.state),  # Place of supply - state code
-            "Addr1": customer.address.split('\n')[0] if customer.address else "",
-            "Addr2": " ".join(customer.address.split('\n')[1:]) if customer.address and len(customer.address.split('\n')) > 1 else "",
+            "Pos": buyer_state_code,  # Place of supply - state code
+            "Addr1": buyer_addr1,
+            "Addr2": buyer_addr2,
             "Loc": customer.state,
-            "Pin": customer.pincode if hasattr(customer, 'pincode') else "",
-            "Stcd": get_state_code(customer.state),  # Get state code from state name
-            "Ph": customer.phone if hasattr(customer, 'phone') else "",
-            "Em": customer.email if hasattr(customer, 'email') else ""
+            "Pin": cust_pin,
+            "Stcd": buyer_state_code,
+            "Ph": cust_phone,
+            "Em": cust_email
         }
         
         # Process items
         item_list = []
+        is_igst = invoice.tax_type == TaxType.IGST
         for idx, (item, product) in enumerate(items, 1):
             # Get basic item details
-            product_name = product.name if hasattr(product, 'name') and product.name else "Product"
-            hsn_sac = product.hsn_sac if hasattr(product, 'hsn_sac') and product.hsn_sac else ""
-            quantity = float(item.quantity) if hasattr(item, 'quantity') else 0
-            rate = float(item.rate) if hasattr(item, 'rate') else 0
-            unit = product.unit if hasattr(product, 'unit') else "NOS"  # Default to NOS (Numbers)
-            
-            # Calculate values
-            taxable_value = float(item.subtotal) if hasattr(item, 'subtotal') else 0
+            product_name = getattr(product, 'name', None) or "Product"
+            hsn_sac = getattr(product, 'hsn_sac', None) or ""
+            unit = getattr(product, 'unit', "NOS")  # Default to NOS (Numbers)
             
-            # Get tax details
-            tax_rate = float(item.tax_rate) if hasattr(item, 'tax_rate') else 0
-            cgst_rate = tax_rate / 2 if invoice.tax_type == TaxType.CGST_SGST else 0
-            sgst_rate = tax_rate / 2 if invoice.tax_type == TaxType.CGST_SGST else 0
-            igst_rate = tax_rate if invoice.tax_type == TaxType.IGST else 0
-            
-            cgst_amount = float(item.cgst) if hasattr(item, 'cgst') else 0
-            sgst_amount = float(item.sgst) if hasattr(item, 'sgst') else 0
-            igst_amount = float(item.igst) if hasattr(item, 'igst') else 0
+            # Read all amounts in one pass; only the tax heads of this invoice's tax type apply
+            quantity, rate, taxable_value, tax_rate, item_total, cgst_amount, sgst_amount, igst_amount = _coerce_item(item)
+            if is_igst:
+                cgst_amount = sgst_amount = 0.0
+            else:
+                igst_amount = 0.0
             
             # Create item entry
-            item_entry = {
-                "SlNo": str(idx),
-                "PrdDesc": product_name,
-                "IsServc": "Y" if (hasattr(product, 'is_service') and product.is_service) else "N",
-                "HsnCd": hsn_sac,
-                "Qty": quantity,
-                "Unit": unit,
-                "UnitPrice": rate,
-                "TotAmt": taxable_value,
-                "Discount": 0,  # Default to 0
-                "AssAmt": taxable_value,
-                "GstRt": tax_rate,
-                "IgstAmt": igst_amount,
-                "CgstAmt": cgst_amount,
-                "SgstAmt": sgst_amount,
-                "CesRt": 0,  # Cess rate - default to 0
-                "CesAmt": 0,  # Cess amount - default to 0
-                "CesNonAdvlAmt": 0,  # Non-advaloram cess - default to 0
-                "StateCesRt": 0,  # State cess rate - default to 0
-                "StateCesAmt": 0,  # State cess amount - default to 0
-                "StateCesNonAdvlAmt": 0,  # State non-advaloram cess - default to 0
-                "OthChrg": 0,  # Other charges - default to 0
-                "TotItemVal": float(item.total) if hasattr(item, 'total') else 0
-            }
+            item_entry = _ITEM_TEMPLATE.copy()
+            item_entry["SlNo"] = str(idx)
+            item_entry["PrdDesc"] = product_name
+            if getattr(product, 'is_service', False):
+                item_entry["IsServc"] = "Y"
+            item_entry["HsnCd"] = hsn_sac
+            item_entry["Qty"] = round(quantity, 3)
+            item_entry["Unit"] = unit
+            item_entry["UnitPrice"] = round(rate, 3)
+            # Round rupee amounts once so serializers never emit float noise
+            taxable_value = round(taxable_value, 2)
+            item_entry["TotAmt"] = taxable_value
+            item_entry["AssAmt"] = taxable_value
+            item_entry["GstRt"] = tax_rate
+            item_entry["IgstAmt"] = round(igst_amount, 2)
+            item_entry["CgstAmt"] = round(cgst_amount, 2)
+            item_entry["SgstAmt"] = round(sgst_amount, 2)
+            item_entry["TotItemVal"] = round(item_total, 2)
             
             item_list.append(item_entry)
         
@@ -1257,16 +1405,16 @@ def generate_gst_irp_json(
         
         # Value details
         value_details = {
-            "AssVal": subtotal,
-            "CgstVal": cgst_total,
-            "SgstVal": sgst_total,
-            "IgstVal": igst_total,
+            "AssVal": round(subtotal, 2),
+            "CgstVal": round(cgst_total, 2),
+            "SgstVal": round(sgst_total, 2),
+            "IgstVal": round(igst_total, 2),
             "CesVal": 0,  # Cess value - default to 0
             "StCesVal": 0,  # State cess value - default to 0
-            "Discount": discount_amount,
+            "Discount": round(discount_amount, 2),
             "OthChrg": 0,  # Other charges - default to 0
-            "RndOffAmt": round_off,
-            "TotInvVal": total_value
+            "RndOffAmt": round(round_off, 2),
+            "TotInvVal": round(total_value, 2)
         }
         
         # Create the final IRP schema JSON
@@ -1283,70 +1431,138 @@ def generate_gst_irp_json(
         return irp_json
         
     except Exception as e:
-        print(f"Error generating GST IRP JSON: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generating GST IRP JSON: %s", e)
         return {"error": str(e)}
 
 
+def dump_gst_irp_json(irp_json: dict) -> bytes:
+    """
+    Serialize an IRP JSON dict for download, indented like the portal's samples
+    """
+    return orjson.dumps(irp_json, option=orjson.OPT_INDENT_2)
+
+
+# GST state codes keyed by upper-case state name
+_STATE_CODES = {
+    "JAMMU AND KASHMIR": "01",
+    "HIMACHAL PRADESH": "02",
+    "PUNJAB": "03",
+    "CHANDIGARH": "04",
+    "UTTARAKHAND": "05",
+    "HARYANA": "06",
+    "DELHI": "07",
+    "RAJASTHAN": "08",
+    "UTTAR PRADESH": "09",
+    "BIHAR": "10",
+    "SIKKIM": "11",
+    "ARUNACHAL PRADESH": "12",
+    "NAGALAND": "13",
+    "MANIPUR": "14",
+    "MIZORAM": "15",
+    "TRIPURA": "16",
+    "MEGHALAYA": "17",
+    "ASSAM": "18",
+    "WEST BENGAL": "19",
+    "JHARKHAND": "20",
+    "ODISHA": "21",
+    "CHHATTISGARH": "22",
+    "MADHYA PRADESH": "23",
+    "GUJARAT": "24",
+    "DADRA AND NAGAR HAVELI AND DAMAN AND DIU": "26",
+    "MAHARASHTRA": "27",
+    "ANDHRA PRADESH": "28",
+    "KARNATAKA": "29",
+    "GOA": "30",
+    "LAKSHADWEEP": "31",
+    "KERALA": "32",
+    "TAMIL NADU": "33",
+    "PUDUCHERRY": "34",
+    "ANDAMAN AND NICOBAR ISLANDS": "35",
+    "TELANGANA": "36",
+    "LADAKH": "38",
+    "OTHER TERRITORY": "97",
+    "FOREIGN COUNTRY": "96",
+    "CENTRE JURISDICTION": "99",
+}
+
+# Common abbreviations and older spellings
+_STATE_ALIASES = {
+    "J&K": "01",
+    "JK": "01",
+    "JAMMU & KASHMIR": "01",
+    "HP": "02",
+    "PB": "03",
+    "CH": "04",
+    "UK": "05",
+    "UTTARANCHAL": "05",
+    "HR": "06",
+    "NCT OF DELHI": "07",
+    "NEW DELHI": "07",
+    "DL": "07",
+    "RJ": "08",
+    "UP": "09",
+    "BR": "10",
+    "SK": "11",
+    "AR": "12",
+    "NL": "13",
+    "MN": "14",
+    "MZ": "15",
+    "TR": "16",
+    "ML": "17",
+    "AS": "18",
+    "WB": "19",
+    "JH": "20",
+    "OD": "21",
+    "ORISSA": "21",
+    "CG": "22",
+    "CHATTISGARH": "22",
+    "MP": "23",
+    "GJ": "24",
+    "DADRA AND NAGAR HAVELI": "26",
+    "DAMAN AND DIU": "26",
+    "MH": "27",
+    "AP": "28",
+    "KA": "29",
+    "GA": "30",
+    "LD": "31",
+    "KL": "32",
+    "TN": "33",
+    "TAMILNADU": "33",
+    "PY": "34",
+    "PONDICHERRY": "34",
+    "AN": "35",
+    "ANDAMAN & NICOBAR ISLANDS": "35",
+    "TS": "36",
+    "TG": "36",
+    "LA": "38",
+}
+
+# Leading word of each state name ("TAMIL", "UTTAR", "MADHYA", ...); all are distinct
+_STATE_FIRST_WORDS = {name.split()[0]: code for name, code in _STATE_CODES.items()}
+
+
+@lru_cache(maxsize=256)
 def get_state_code(state_name: str) -> str:
     """
     Get the state code for GST based on state name.
     Returns the 2-digit state code required by the GST portal.
     """
-    state_codes = {
-        "JAMMU AND KASHMIR": "01",
-        "HIMACHAL PRADESH": "02",
-        "PUNJAB": "03",
-        "CHANDIGARH": "04",
-        "UTTARAKHAND": "05",
-        "HARYANA": "06",
-        "DELHI": "07",
-        "RAJASTHAN": "08",
-        "UTTAR PRADESH": "09",
-        "BIHAR": "10",
-        "SIKKIM": "11",
-        "ARUNACHAL PRADESH": "12",
-        "NAGALAND": "13",
-        "MANIPUR": "14",
-        "MIZORAM": "15",
-        "TRIPURA": "16",
-        "MEGHALAYA": "17",
-        "ASSAM": "18",
-        "WEST BENGAL": "19",
-        "JHARKHAND": "20",
-        "ODISHA": "21",
-        "CHHATTISGARH": "22",
-        "MADHYA PRADESH": "23",
-        "GUJARAT": "24",
-        "DADRA AND NAGAR HAVELI AND DAMAN AND DIU": "26",
-        "MAHARASHTRA": "27",
-        "ANDHRA PRADESH": "28",
-        "KARNATAKA": "29",
-        "GOA": "30",
-        "LAKSHADWEEP": "31",
-        "KERALA": "32",
-        "TAMIL NADU": "33",
-        "PUDUCHERRY": "34",
-        "ANDAMAN AND NICOBAR ISLANDS": "35",
-        "TELANGANA": "36",
-        "LADAKH": "38",
-        "OTHER TERRITORY": "97",
-        "FOREIGN COUNTRY": "96",
-        "CENTRE JURISDICTION": "99"
-    }
-    
     # Normalize state name for comparison
     normalized_state = state_name.strip().upper()
     
-    # Try direct match
-    if normalized_state in state_codes:
-        return state_codes[normalized_state]
+    # Try direct match, then known aliases, then a bare leading word
+    code = (
+        _STATE_CODES.get(normalized_state)
+        or _STATE_ALIASES.get(normalized_state)
+        or _STATE_FIRST_WORDS.get(normalized_state)
+    )
+    if code:
+        return code
     
-    # Try partial match
-    for state, code in state_codes.items():
+    # Try partial match; cached, so this only runs once per unrecognised spelling
+    for state, code in _STATE_CODES.items():
         if state in normalized_state or normalized_state in state:
             return code
     
     # Default to Other Territory if no match found
-    return "97"
\ No newline at end of file
+    return "97"
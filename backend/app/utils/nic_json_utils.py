@@ -1,10 +1,83 @@
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
-from sqlalchemy.orm import Session
+from functools import lru_cache
+import orjson
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.models import Invoice, BusinessProfile, Customer, InvoiceItem, Product, TaxType
 
 
+def _r2(value) -> float:
+    # Rupee amount rounded to paise; NULL amounts count as 0
+    return round(float(value or 0), 2)
+
+
+def _r3(value) -> float:
+    # Quantity rounded to the 3 decimals NIC allows
+    return round(float(value), 3)
+
+
+def load_invoice_with_items(
+    db: Session,
+    invoice_id: int,
+    user_id: int
+) -> Optional[Invoice]:
+    """
+    Load a user's invoice with its items and their products in two queries
+    Business profile and customer come along through the invoice's joined relationships
+    """
+    return db.query(Invoice).join(
+        BusinessProfile
+    ).options(
+        selectinload(Invoice.items).joinedload(InvoiceItem.product)
+    ).filter(
+        Invoice.id == invoice_id,
+        BusinessProfile.user_id == user_id
+    ).first()
+
+
+# Internal supply types mapped to GST portal supply types
+_NIC_SUPPLY_TYPES = {
+    'B2B': 'B2B',
+    'B2C': 'B2C',
+    'EXPORT_WITH_TAX': 'EXPWP',  # Export With Payment of Tax
+    'EXPORT_WITHOUT_TAX': 'EXPWOP',  # Export Without Payment of Tax
+    'SEZ_WITH_TAX': 'SEZWP',  # SEZ With Payment of Tax
+    'SEZ_WITHOUT_TAX': 'SEZWOP',  # SEZ Without Payment of Tax
+    'DEEMED_EXPORT': 'DEXP',  # Deemed Export
+    'COMPOSITE': 'COMP'  # Composition Dealer
+}
+
+# TranDtls fields that are the same on every invoice
+_NIC_TRAN_FLAGS = {
+    "RegRev": "N",
+    "EcmGstin": None,
+    "IgstOnIntra": "N"
+}
+
+
+def _base_item(i: int, item: InvoiceItem, product: Product) -> Dict[str, Any]:
+    """
+    NIC item fields shared by IGST and CGST/SGST invoices
+    """
+    subtotal = _r2(item.subtotal)
+    return {
+        "SlNo": str(i),
+        "PrdDesc": product.name,
+        "IsServc": "Y" if product.hsn_sac.startswith("99") else "N",  # Service HSN starts with 99
+        "HsnCd": product.hsn_sac,
+        "Qty": _r3(item.quantity),
+        "Unit": product.unit,
+        "UnitPrice": _r2(item.rate),
+        "TotAmt": subtotal,
+        "Discount": _r2(item.discount_amount),  # _r2 maps NULL to 0
+        "AssAmt": subtotal,
+        "GstRt": _r2(product.tax_rate),
+        "TotItemVal": _r2(item.total)
+    }
+
+
 def invoice_to_nic_json(
     invoice: Invoice,
     business_profile: BusinessProfile,
@@ -18,35 +91,23 @@ def invoice_to_nic_json(
     if hasattr(invoice, 'supply_type'):
         raw_supply_type = str(invoice.supply_type).split('.')[-1]
         
-        # Map internal supply types to GST portal supply types
-        supply_type_mapping = {
-            'B2B': 'B2B',
-            'B2C': 'B2C',
-            'EXPORT_WITH_TAX': 'EXPWP',  # Export With Payment of Tax
-            'EXPORT_WITHOUT_TAX': 'EXPWOP',  # Export Without Payment of Tax
-            'SEZ_WITH_TAX': 'SEZWP',  # SEZ With Payment of Tax
-            'SEZ_WITHOUT_TAX': 'SEZWOP',  # SEZ Without Payment of Tax
-            'DEEMED_EXPORT': 'DEXP',  # Deemed Export
-            'COMPOSITE': 'COMP'  # Composition Dealer
-        }
-        
-        supply_type = supply_type_mapping.get(raw_supply_type, 'B2B')
+        supply_type = _NIC_SUPPLY_TYPES.get(raw_supply_type, 'B2B')
     else:
         supply_type = 'B2B'
     
     # Determine if this is an export transaction
     is_export = supply_type in ['EXPWP', 'EXPWOP']
     
+    # Buyer state code, used for both place of supply and the buyer address
+    buyer_state_code = "96" if is_export else get_state_code(customer.state)
+    
+    # Items are appended to this list directly by the loops below
+    items_list = []
+    
     # Basic structure for NIC format
     nic_json = {
         "Version": "1.1",
-        "TranDtls": {
-            "TaxSch": "GST",
-            "SupTyp": supply_type,
-            "RegRev": "N",
-            "EcmGstin": None,
-            "IgstOnIntra": "N"
-        },
+        "TranDtls": {"TaxSch": "GST", "SupTyp": supply_type, **_NIC_TRAN_FLAGS},
         "DocDtls": {
             "Typ": "INV",
             "No": invoice.invoice_number,
@@ -67,73 +128,73 @@ def invoice_to_nic_json(
             "Gstin": get_customer_gstin(customer, supply_type),
             "LglNm": customer.name,
             "TrdNm": customer.name,
-            "Pos": "96" if is_export else get_state_code(customer.state),
+            "Pos": buyer_state_code,
             "Addr1": customer.address,
             "Loc": customer.state,
             "Pin": customer.pincode or 110001,  # Default to Delhi pincode if not available
-            "Stcd": "96" if is_export else get_state_code(customer.state),
+            "Stcd": buyer_state_code,
             "Ph": customer.phone or "",
             "Em": customer.email or ""
         },
-        "ItemList": [],
+        "ItemList": items_list,
         "ValDtls": {
-            "AssVal": round(float(invoice.subtotal), 2),
-            "CgstVal": round(float(invoice.cgst_total or 0), 2),
-            "SgstVal": round(float(invoice.sgst_total or 0), 2),
-            "IgstVal": round(float(invoice.igst_total or 0), 2),
-            "TotInvVal": round(float(invoice.total), 2),
-            "RndOffAmt": round(float(invoice.round_off if hasattr(invoice, 'round_off') else 0), 2)
+            "AssVal": _r2(invoice.subtotal),
+            "CgstVal": _r2(invoice.cgst_total),
+            "SgstVal": _r2(invoice.sgst_total),
+            "IgstVal": _r2(invoice.igst_total),
+            "TotInvVal": _r2(invoice.total),
+            "RndOffAmt": _r2(getattr(invoice, 'round_off', 0))
         }
     }
     
-    # Add items
-    for i, (item, product) in enumerate(items, 1):
-        nic_item = {
-            "SlNo": str(i),
-            "PrdDesc": product.name,
-            "IsServc": "Y" if product.hsn_sac.startswith("99") else "N",  # Service HSN starts with 99
-            "HsnCd": product.hsn_sac,
-            "Qty": round(float(item.quantity), 3),
-            "Unit": product.unit,
-            "UnitPrice": round(float(item.rate), 2),
-            "TotAmt": round(float(item.subtotal), 2),
-            "Discount": round(float(item.discount_amount if hasattr(item, 'discount_amount') else 0), 2),
-            "AssAmt": round(float(item.subtotal), 2),
-            "GstRt": round(float(product.tax_rate), 2),
-            "TotItemVal": round(float(item.total), 2)
-        }
-        
-        # Set tax values based on tax type
-        if invoice.tax_type == TaxType.IGST:
+    # Add items, with one loop per tax type since it is the same for every item
+    if invoice.tax_type == TaxType.IGST:
+        for i, (item, product) in enumerate(items, 1):
+            nic_item = _base_item(i, item, product)
             nic_item.update({
-                "IgstAmt": round(float(item.igst), 2),
+                "IgstAmt": _r2(item.igst),
                 "CgstAmt": 0,
                 "SgstAmt": 0
             })
-        else:
+            items_list.append(nic_item)
+    else:
+        for i, (item, product) in enumerate(items, 1):
+            nic_item = _base_item(i, item, product)
             nic_item.update({
                 "IgstAmt": 0,
-                "CgstAmt": round(float(item.cgst), 2),
-                "SgstAmt": round(float(item.sgst), 2)
+                "CgstAmt": _r2(item.cgst),
+                "SgstAmt": _r2(item.sgst)
             })
-            
-        nic_json["ItemList"].append(nic_item)
+            items_list.append(nic_item)
         
     return nic_json
 
 
+def dumps_nic(obj: Any) -> bytes:
+    """
+    Serialize NIC JSON (or a response wrapping it) to compact UTF-8 bytes
+    """
+    return orjson.dumps(obj)
+
+
 def nic_json_to_invoice(
     nic_json: Dict[str, Any],
     db: Session,
-    user_id: int
+    user_id: int,
+    commit: bool = True
 ) -> Invoice:
     """
     Convert NIC JSON format to invoice data and save to database
+
+    With commit=False the rows are only flushed, so a caller importing
+    several invoices can commit them together.
     """
     # Get basic invoice details
     invoice_number = nic_json["DocDtls"]["No"]
     invoice_date_str = nic_json["DocDtls"]["Dt"]
-    invoice_date = datetime.strptime(invoice_date_str, "%d/%m/%Y")
+    # NIC dates are always DD/MM/YYYY, so split instead of going through strptime
+    day, month, year = invoice_date_str.split("/")
+    invoice_date = datetime(int(year), int(month), int(day))
     
     # Get seller details (business profile)
     seller_gstin = nic_json["SellerDtls"]["Gstin"]
@@ -208,104 +269,151 @@ def nic_json_to_invoice(
     db.add(invoice)
     db.flush()
     
-    # Process items
-    for nic_item in nic_json["ItemList"]:
-        hsn_sac = nic_item["HsnCd"]
-        
-        # Find product if it exists
-        product = db.query(Product).filter(
-            Product.hsn_sac == hsn_sac,
-            Product.name == nic_item["PrdDesc"],
-            Product.user_id == user_id
-        ).first()
-        
-        if not product:
-            # Create product if it doesn't exist
+    # Find all existing products for the items in one query
+    item_list = nic_json["ItemList"]
+    product_keys = {(nic_item["HsnCd"], nic_item["PrdDesc"]) for nic_item in item_list}
+    products_by_key = {}
+    if product_keys:
+        existing_products = db.query(Product).filter(
+            Product.user_id == user_id,
+            tuple_(Product.hsn_sac, Product.name).in_(product_keys)
+        ).all()
+        products_by_key = {(product.hsn_sac, product.name): product for product in existing_products}
+    
+    # Create products that don't exist yet and insert them in one flush
+    new_products = []
+    for nic_item in item_list:
+        key = (nic_item["HsnCd"], nic_item["PrdDesc"])
+        if key not in products_by_key:
             product = Product(
                 user_id=user_id,
                 name=nic_item["PrdDesc"],
-                hsn_sac=hsn_sac,
+                hsn_sac=nic_item["HsnCd"],
                 tax_rate=nic_item["GstRt"],
                 unit=nic_item["Unit"],
                 description=None  # Not in NIC format
             )
-            db.add(product)
-            db.flush()
-        
-        # Create invoice item
-        invoice_item = InvoiceItem(
-            invoice_id=invoice.id,
-            product_id=product.id,
-            quantity=nic_item["Qty"],
-            rate=nic_item["UnitPrice"],
-            tax_rate=nic_item["GstRt"],
-            tax_amount=(nic_item.get("IgstAmt", 0) + nic_item.get("CgstAmt", 0) + nic_item.get("SgstAmt", 0)),
-            subtotal=nic_item["AssAmt"],
-            total=nic_item["TotItemVal"],
-            cgst=nic_item.get("CgstAmt", 0) or None,
-            sgst=nic_item.get("SgstAmt", 0) or None,
-            igst=nic_item.get("IgstAmt", 0) or None,
-            tax_type=tax_type
-        )
-        
-        db.add(invoice_item)
+            products_by_key[key] = product
+            new_products.append(product)
+    
+    if new_products:
+        db.add_all(new_products)
+        db.flush()
+    
+    # Build invoice item rows and insert them in one batch
+    item_rows = []
+    for nic_item in item_list:
+        product = products_by_key[(nic_item["HsnCd"], nic_item["PrdDesc"])]
+        item_rows.append({
+            "invoice_id": invoice.id,
+            "product_id": product.id,
+            "quantity": nic_item["Qty"],
+            "rate": nic_item["UnitPrice"],
+            "tax_rate": nic_item["GstRt"],
+            "tax_amount": (nic_item.get("IgstAmt", 0) + nic_item.get("CgstAmt", 0) + nic_item.get("SgstAmt", 0)),
+            "subtotal": nic_item["AssAmt"],
+            "total": nic_item["TotItemVal"],
+            "cgst": nic_item.get("CgstAmt", 0) or None,
+            "sgst": nic_item.get("SgstAmt", 0) or None,
+            "igst": nic_item.get("IgstAmt", 0) or None,
+            "tax_type": tax_type,
+        })
     
-    db.commit()
-    db.refresh(invoice)
+    if item_rows:
+        db.bulk_insert_mappings(InvoiceItem, item_rows)
+    
+    if commit:
+        db.commit()
+        db.refresh(invoice)
+    else:
+        db.flush()
     
     return invoice
 
 
+# GST state codes keyed by state name, as used in NIC JSON
+_STATE_CODES = {
+    "Andhra Pradesh": "37",
+    "Arunachal Pradesh": "12",
+    "Assam": "18",
+    "Bihar": "10",
+    "Chhattisgarh": "22",
+    "Goa": "30",
+    "Gujarat": "24",
+    "Haryana": "06",
+    "Himachal Pradesh": "02",
+    "Jharkhand": "20",
+    "Karnataka": "29",
+    "Kerala": "32",
+    "Madhya Pradesh": "23",
+    "Maharashtra": "27",
+    "Manipur": "14",
+    "Meghalaya": "17",
+    "Mizoram": "15",
+    "Nagaland": "13",
+    "Odisha": "21",
+    "Punjab": "03",
+    "Rajasthan": "08",
+    "Sikkim": "11",
+    "Tamil Nadu": "33",
+    "Telangana": "36",
+    "Tripura": "16",
+    "Uttar Pradesh": "09",
+    "Uttarakhand": "05",
+    "West Bengal": "19",
+    "Andaman and Nicobar Islands": "35",
+    "Chandigarh": "04",
+    "Dadra and Nagar Haveli and Daman and Diu": "26",
+    "Delhi": "07",
+    "Jammu and Kashmir": "01",
+    "Ladakh": "38",
+    "Lakshadweep": "31",
+    "Puducherry": "34",
+}
+
+# Lower-cased names for the partial-match fallback
+_STATE_CODES_LOWER = tuple((name.lower(), code) for name, code in _STATE_CODES.items())
+
+# Common two-letter state abbreviations, lower-cased
+_STATE_ABBREVIATIONS = {
+    "jk": "01", "hp": "02", "pb": "03", "ch": "04", "uk": "05", "hr": "06", "dl": "07",
+    "rj": "08", "up": "09", "br": "10", "sk": "11", "ar": "12", "nl": "13", "mn": "14",
+    "mz": "15", "tr": "16", "ml": "17", "as": "18", "wb": "19", "jh": "20", "od": "21",
+    "cg": "22", "mp": "23", "gj": "24", "mh": "27", "ka": "29", "ga": "30", "ld": "31",
+    "kl": "32", "tn": "33", "py": "34", "an": "35", "ts": "36", "tg": "36", "ap": "37",
+    "la": "38",
+}
+
+# Every accepted spelling -> code: exact name, lower-case, lower-case without spaces,
+# plus the abbreviations
+_STATE_CANON = {
+    **_STATE_ABBREVIATIONS,
+    **{
+        spelling: code
+        for name, code in _STATE_CODES.items()
+        for spelling in (name, name.lower(), name.lower().replace(" ", ""))
+    },
+}
+
+
+@lru_cache(maxsize=128)
 def get_state_code(state_name: str) -> str:
     """
     Get state code from state name
     """
-    state_codes = {
-        "Andhra Pradesh": "37",
-        "Arunachal Pradesh": "12",
-        "Assam": "18",
-        "Bihar": "10",
-        "Chhattisgarh": "22",
-        "Goa": "30",
-        "Gujarat": "24",
-        "Haryana": "06",
-        "Himachal Pradesh": "02",
-        "Jharkhand": "20",
-        "Karnataka": "29",
-        "Kerala": "32",
-        "Madhya Pradesh": "23",
-        "Maharashtra": "27",
-        "Manipur": "14",
-        "Meghalaya": "17",
-        "Mizoram": "15",
-        "Nagaland": "13",
-        "Odisha": "21",
-        "Punjab": "03",
-        "Rajasthan": "08",
-        "Sikkim": "11",
-        "Tamil Nadu": "33",
-        "Telangana": "36",
-        "Tripura": "16",
-        "Uttar Pradesh": "09",
-        "Uttarakhand": "05",
-        "West Bengal": "19",
-        "Andaman and Nicobar Islands": "35",
-        "Chandigarh": "04",
-        "Dadra and Nagar Haveli and Daman and Diu": "26",
-        "Delhi": "07",
-        "Jammu and Kashmir": "01",
-        "Ladakh": "38",
-        "Lakshadweep": "31",
-        "Puducherry": "34",
-    }
+    # Try exact, case-insensitive and space-insensitive matches, then abbreviations
+    code = _STATE_CANON.get(state_name)
+    if code:
+        return code
     
-    # Try to find exact match
-    if state_name in state_codes:
-        return state_codes[state_name]
+    state_lower = state_name.lower()
+    code = _STATE_CANON.get(state_lower) or _STATE_CANON.get(state_lower.replace(" ", ""))
+    if code:
+        return code
     
     # Try to find partial match
-    for name, code in state_codes.items():
-        if name.lower() in state_name.lower() or state_name.lower() in name.lower():
+    for name_lower, code in _STATE_CODES_LOWER:
+        if name_lower in state_lower or state_lower in name_lower:
             return code
     
     # Default to Delhi if no match found
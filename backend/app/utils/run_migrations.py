@@ -1,15 +1,40 @@
+import os
 from sqlalchemy import create_engine
 from app.db.base import Base
 from app.core.config import settings
 import logging
 
+# backend/alembic.ini and backend/alembic/, resolved relative to this file; the
+# ini's script_location is relative to the cwd, so it is overridden below
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ALEMBIC_INI = os.path.join(BACKEND_DIR, "alembic.ini")
+ALEMBIC_SCRIPTS = os.path.join(BACKEND_DIR, "alembic")
+
 def run_migrations():
+    # USE_ALEMBIC=1 upgrades through the Alembic revisions, otherwise tables
+    # are created straight from the SQLAlchemy models. Errors are logged and
+    # re-raised so callers don't report a failed migration as successful.
+    if os.getenv("USE_ALEMBIC", "0") == "1":
+        from alembic import command
+        from alembic.config import Config
+
+        try:
+            config = Config(ALEMBIC_INI)
+            config.set_main_option("script_location", ALEMBIC_SCRIPTS)
+            command.upgrade(config, "head")
+            logging.info("✅ Alembic migrations applied successfully.")
+        except Exception as e:
+            logging.error(f"❌ Failed to apply Alembic migrations: {e}")
+            raise
+        return
+
     try:
         engine = create_engine(str(settings.DATABASE_URL))  # <-- convert to string
         Base.metadata.create_all(bind=engine)
         logging.info("✅ Tables created successfully from SQLAlchemy models.")
     except Exception as e:
         logging.error(f"❌ Failed to create tables: {e}")
+        raise
 
 if __name__ == "__main__":
     run_migrations()
@@ -1,6 +1,14 @@
 import re
+from functools import lru_cache
 from typing import Optional, Tuple, Dict
 
+# First 2 digits (state code) + 10 chars (PAN) + 1 digit (entity) + 1 char (Z) + 1 char (check digit)
+_GSTIN_RE = re.compile(r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[0-9A-Z]{1}[Z]{1}[0-9A-Z]{1}$')
+
+# SAC codes are 6 digits; HSN codes are 4, 6 or 8 digits
+_SAC_RE = re.compile(r'^\d{6}$')
+_HSN_RE = re.compile(r'^\d{4}(\d{2}(\d{2})?)?$')
+
 
 def validate_hsn_sac(code: str, is_service: bool = False) -> Tuple[bool, Optional[str]]:
     """
@@ -21,16 +29,17 @@ def validate_hsn_sac(code: str, is_service: bool = False) -> Tuple[bool, Optiona
     
     if is_service:
         # SAC codes are 6 digits
-        if not re.match(r'^\d{6}$', code):
+        if not _SAC_RE.match(code):
             return False, "SAC code must be exactly 6 digits"
     else:
         # HSN codes can be 4, 6, or 8 digits (most common are 4 or 8)
-        if not re.match(r'^\d{4}(\d{2}(\d{2})?)?$', code):
+        if not _HSN_RE.match(code):
             return False, "HSN code must be 4, 6, or 8 digits"
     
     return True, None
 
 
+@lru_cache(maxsize=4096)
 def validate_gstin(gstin: str, country: str = "India") -> Tuple[bool, Optional[str]]:
     """
     Validates Indian Goods and Services Tax Identification Number (GSTIN)
@@ -68,11 +77,8 @@ def validate_gstin(gstin: str, country: str = "India") -> Tuple[bool, Optional[s
     if len(gstin) != 15:
         return False, "GSTIN must be exactly 15 characters"
     
-    # Check format using regex
-    # First 2 digits (state code) + 10 chars (PAN) + 1 digit (entity) + 1 char (Z) + 1 char (check digit)
-    gstin_pattern = r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[0-9A-Z]{1}[Z]{1}[0-9A-Z]{1}$'
-    
-    if not re.match(gstin_pattern, gstin):
+    # Check format using the precompiled regex
+    if not _GSTIN_RE.match(gstin):
         return False, "GSTIN format is invalid"
     
     # Validate state code (optional, can be expanded with full state code list)
@@ -83,6 +89,49 @@ def validate_gstin(gstin: str, country: str = "India") -> Tuple[bool, Optional[s
     return True, None
 
 
+# State names keyed by the 2-digit GSTIN state code
+_GSTIN_STATE_NAMES: Dict[str, str] = {
+    "01": "Jammu and Kashmir",
+    "02": "Himachal Pradesh",
+    "03": "Punjab",
+    "04": "Chandigarh",
+    "05": "Uttarakhand",
+    "06": "Haryana",
+    "07": "Delhi",
+    "08": "Rajasthan",
+    "09": "Uttar Pradesh",
+    "10": "Bihar",
+    "11": "Sikkim",
+    "12": "Arunachal Pradesh",
+    "13": "Nagaland",
+    "14": "Manipur",
+    "15": "Mizoram",
+    "16": "Tripura",
+    "17": "Meghalaya",
+    "18": "Assam",
+    "19": "West Bengal",
+    "20": "Jharkhand",
+    "21": "Odisha",
+    "22": "Chhattisgarh",
+    "23": "Madhya Pradesh",
+    "24": "Gujarat",
+    "25": "Daman and Diu",
+    "26": "Dadra and Nagar Haveli",
+    "27": "Maharashtra",
+    "28": "Andhra Pradesh (before split)",
+    "29": "Karnataka",
+    "30": "Goa",
+    "31": "Lakshadweep",
+    "32": "Kerala",
+    "33": "Tamil Nadu",
+    "34": "Puducherry",
+    "35": "Andaman and Nicobar Islands",
+    "36": "Telangana",
+    "37": "Andhra Pradesh (after split)",
+    "38": "Ladakh"
+}
+
+
 def get_state_from_gstin(gstin: str) -> Optional[str]:
     """
     Extract state name from GSTIN
@@ -96,48 +145,57 @@ def get_state_from_gstin(gstin: str) -> Optional[str]:
     if not gstin or len(gstin) < 2:
         return None
     
-    state_code = gstin[0:2]
-    
-    # State code mapping
-    state_codes: Dict[str, str] = {
-        "01": "Jammu and Kashmir",
-        "02": "Himachal Pradesh",
-        "03": "Punjab",
-        "04": "Chandigarh",
-        "05": "Uttarakhand",
-        "06": "Haryana",
-        "07": "Delhi",
-        "08": "Rajasthan",
-        "09": "Uttar Pradesh",
-        "10": "Bihar",
-        "11": "Sikkim",
-        "12": "Arunachal Pradesh",
-        "13": "Nagaland",
-        "14": "Manipur",
-        "15": "Mizoram",
-        "16": "Tripura",
-        "17": "Meghalaya",
-        "18": "Assam",
-        "19": "West Bengal",
-        "20": "Jharkhand",
-        "21": "Odisha",
-        "22": "Chhattisgarh",
-        "23": "Madhya Pradesh",
-        "24": "Gujarat",
-        "25": "Daman and Diu",
-        "26": "Dadra and Nagar Haveli",
-        "27": "Maharashtra",
-        "28": "Andhra Pradesh (before split)",
-        "29": "Karnataka",
-        "30": "Goa",
-        "31": "Lakshadweep",
-        "32": "Kerala",
-        "33": "Tamil Nadu",
-        "34": "Puducherry",
-        "35": "Andaman and Nicobar Islands",
-        "36": "Telangana",
-        "37": "Andhra Pradesh (after split)",
-        "38": "Ladakh"
-    }
-    
-    return state_codes.get(state_code) 
\ No newline at end of file
+    return _GSTIN_STATE_NAMES.get(gstin[0:2])
+
+
+def validate_email_address(email: str) -> Tuple[bool, Optional[str]]:
+    """
+    Validates an email address with the email-validator package
+    
+    Args:
+        email: The email address to validate
+    
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if not email:
+        return False, "Email is required"
+    
+    normalized, error_message = _validate_email_strict(email)
+    return normalized is not None, error_message
+
+
+def normalize_email_address(email: str) -> str:
+    """
+    Validates an email address and returns its normalized form
+    (e.g. the domain lowercased), as pydantic's EmailStr would store it
+    
+    Args:
+        email: The email address to validate
+    
+    Returns:
+        The normalized email address
+    
+    Raises:
+        ValueError: If the email address is not valid
+    """
+    if not email:
+        raise ValueError("Email is required")
+    
+    normalized, error_message = _validate_email_strict(email)
+    if normalized is None:
+        raise ValueError(error_message)
+    return normalized
+
+
+@lru_cache(maxsize=2048)
+def _validate_email_strict(email: str) -> Tuple[Optional[str], Optional[str]]:
+    # Imported lazily so importing this module never loads email-validator
+    from email_validator import EmailNotValidError, validate_email
+    
+    try:
+        result = validate_email(email, check_deliverability=False)
+    except EmailNotValidError as e:
+        return None, str(e)
+    
+    return result.normalized, None
@@ -6,15 +6,20 @@ from app.core.config import settings
 # ✅ Import your Alembic migration runner
 from app.utils.run_migrations import run_migrations
 
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger(__name__)
+
 if __name__ == "__main__":
-    logging.info("Starting GSTInvoicePro API server")
+    logger.info("Starting GSTInvoicePro API server")
 
-    # ✅ Run Alembic migrations before starting FastAPI
-    try:
-        run_migrations()
-        logging.info("Database migration completed successfully.")
-    except Exception as e:
-        logging.error(f"Error during DB migration: {e}")
+    # ✅ Run migrations before starting FastAPI (RUN_MIGRATIONS=0 skips them,
+    # e.g. when restarting the dev server against an up-to-date schema)
+    if os.getenv("RUN_MIGRATIONS", "1") == "1":
+        try:
+            run_migrations()
+            logger.info("Database migration completed successfully.")
+        except Exception as e:
+            logger.error(f"Error during DB migration: {e}")
 
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
@@ -0,0 +1,55 @@
+import unittest
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from app.models import BusinessProfile, Customer, Invoice, InvoiceItem, Product
+from app.utils import invoice_utils
+
+
+class ItemsTableHeaderTest(unittest.TestCase):
+    def assert_headers_fit(self, cells, col_widths):
+        self.assertEqual(len(cells), len(col_widths))
+        for header, col_width in zip(cells, col_widths):
+            usable = col_width - 2 * invoice_utils._ITEMS_HEADER_PADDING
+            for line in header.split("\n"):
+                with self.subTest(header=line):
+                    width = stringWidth(
+                        line, invoice_utils._ITEMS_HEADER_FONT, invoice_utils._ITEMS_HEADER_FONT_SIZE
+                    )
+                    self.assertLessEqual(width, usable)
+
+    def test_igst_headers_fit_columns(self):
+        self.assert_headers_fit(invoice_utils._IGST_HEADER_CELLS, invoice_utils._IGST_COL_WIDTHS)
+
+    def test_cgst_sgst_headers_fit_columns(self):
+        self.assert_headers_fit(invoice_utils._CGST_SGST_HEADER_CELLS, invoice_utils._CGST_SGST_COL_WIDTHS)
+
+
+class PdfCacheKeyTest(unittest.TestCase):
+    def make_rows(self):
+        invoice = Invoice(id=1, invoice_number="INV-1", total=118)
+        business_profile = BusinessProfile(id=1, name="Acme")
+        customer = Customer(id=1, name="Beta")
+        item = InvoiceItem(id=1, quantity=1, rate=100, total=118)
+        product = Product(id=1, name="Widget")
+        return invoice, business_profile, customer, [(item, product)]
+
+    def test_key_changes_when_item_content_changes(self):
+        invoice, business_profile, customer, items = self.make_rows()
+        before = invoice_utils._pdf_cache_key(invoice, business_profile, customer, items)
+        items[0][0].quantity = 2
+        after = invoice_utils._pdf_cache_key(invoice, business_profile, customer, items)
+        self.assertNotEqual(before, after)
+
+    def test_key_is_stable_for_unchanged_rows(self):
+        rows = self.make_rows()
+        self.assertEqual(invoice_utils._pdf_cache_key(*rows), invoice_utils._pdf_cache_key(*rows))
+
+    def test_unsaved_invoice_is_not_cached(self):
+        invoice, business_profile, customer, items = self.make_rows()
+        invoice.id = None
+        self.assertIsNone(invoice_utils._pdf_cache_key(invoice, business_profile, customer, items))
+
+
+if __name__ == "__main__":
+    unittest.main()
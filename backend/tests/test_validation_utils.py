@@ -0,0 +1,36 @@
+import unittest
+
+from app.utils.validation_utils import normalize_email_address, validate_email_address
+
+
+class ValidateEmailAddressTest(unittest.TestCase):
+    def test_accepts_plain_address(self):
+        self.assertEqual(validate_email_address("user@example.com"), (True, None))
+
+    def test_rejects_malformed_addresses(self):
+        for email in (
+            "",
+            "a..b@example.com",
+            ".a@example.com",
+            "a.@example.com",
+            "a@-example.com",
+            "a@example-.com",
+            "a@example..com",
+            "a@foo.test",
+            "a@foo.local",
+        ):
+            with self.subTest(email=email):
+                is_valid, error_message = validate_email_address(email)
+                self.assertFalse(is_valid)
+                self.assertTrue(error_message)
+
+    def test_normalizes_domain(self):
+        self.assertEqual(normalize_email_address("User@Example.COM"), "User@example.com")
+
+    def test_normalize_raises_on_invalid(self):
+        with self.assertRaises(ValueError):
+            normalize_email_address("a..b@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()